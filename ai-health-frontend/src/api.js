@@ -15,3 +15,36 @@ export async function post(endpoint, data) {
 
   return await res.json();
 }
+
+export async function postNdjson(endpoint, data, onItem) {
+  const res = await fetch(`${BASE_URL}${endpoint}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(data),
+  });
+
+  if (!res.ok) {
+    throw new Error("API request failed");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop();
+
+    for (const line of lines) {
+      if (line.trim()) onItem(JSON.parse(line));
+    }
+  }
+
+  if (buffer.trim()) onItem(JSON.parse(buffer));
+}
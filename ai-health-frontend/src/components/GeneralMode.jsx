@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { post } from "../api";
+import { post, postNdjson } from "../api";
 import OutputBox from "./OutputBox";
 import GeneralProfileForm from "./GeneralProfileForm";
 
@@ -13,6 +13,17 @@ export default function GeneralMode() {
     setOutput(res[key]);
   }
 
+  async function runFullPlan() {
+    const sections = [];
+    setOutput("");
+
+    await postNdjson("/general/full-plan", profile, (item) => {
+      if (item.done) return;
+      sections.push(item.content ?? `❌ ${item.section}: ${item.error}`);
+      setOutput(sections.join("\n\n---\n\n"));
+    });
+  }
+
   // 1️⃣ If profile not filled → show form
   if (!profile) {
     return <GeneralProfileForm onSubmit={setProfile} />;
@@ -31,6 +42,7 @@ export default function GeneralMode() {
         <button onClick={() => run("/general/mental")}>🧠 Mental Wellness</button>
         <button onClick={() => run("/general/protein")}>🥩 Protein Planning</button>
         <button onClick={() => run("/general/what-if")}>🔮 What-If Simulation</button>
+        <button onClick={runFullPlan}>📋 Full Plan</button>
       </div>
 
       <OutputBox title="AI Response" content={output} />
@@ -1,67 +1,607 @@
-from agno.agent import Agent
-from agno.models.groq import Groq
+import asyncio
+import os
+import re
+import threading
+import time
+from contextlib import aclosing, asynccontextmanager, contextmanager
+
 from dotenv import load_dotenv
 
+from app.http_client import get_http_client
+from app.latency import LatencyWindow
+from app.metrics import (
+    COLLECTORS,
+    LLM_IN_FLIGHT,
+    Family,
+    record_stage,
+    role_label,
+    stage,
+    stats_families,
+    window_samples,
+)
+from app.prompt_format import estimate_tokens, static_tokens
+from app.prompts import PROMPTS
+from app.resilience import LLMError, ModelGuard, as_llm_error, error_from_message
+
 load_dotenv()
 
 MODEL = "llama-3.1-8b-instant"
 
-def safe_run(agent, prompt):
-    response = agent.run(prompt)
-    return getattr(response, "content", str(response))
+# Max in-flight LLM calls per model, per process. Override globally with
+# LLM_MAX_CONCURRENCY or for one model with e.g.
+# LLM_MAX_CONCURRENCY__LLAMA_3_1_8B_INSTANT.
+DEFAULT_MAX_CONCURRENCY = 128
 
-# ===== STUDENT AGENTS =====
-student_health_agent = Agent(
-    model=Groq(id=MODEL),
-    description="college student health risk analyst",
-    markdown=True
-)
+# "groq" or "fake" (app/fake_llm.py: offline stub for load testing).
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
 
-sleep_analyzer_agent = Agent(
-    model=Groq(id=MODEL),
-    description="student sleep pattern analyst",
-    markdown=True
-)
+# Max agents per task pool. Agents keep per-run state, so each
+# concurrent run checks out an agent of its own.
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "32"))
 
-nutrient_risk_agent = Agent(
-    model=Groq(id=MODEL),
-    description="student nutrient deficiency risk assessor",
-    markdown=True
-)
 
-student_advisor_agent = Agent(
-    model=Groq(id=MODEL),
-    description="college lifestyle and academic advisor",
-    markdown=True
-)
+def model_setting(name, model_id, default):
+    suffix = re.sub(r"[^0-9A-Za-z]+", "_", model_id).strip("_").upper()
+    value = os.getenv(f"{name}__{suffix}", os.getenv(name))
+    if value is None or value == "":
+        return default
+    return type(default)(value)
 
-mess_food_agent = Agent(
-    model=Groq(id=MODEL),
-    description="hostel mess food optimization expert",
-    markdown=True
-)
 
-budget_meal_agent = Agent(
-    model=Groq(id=MODEL),
-    description="budget hostel meal planner",
-    markdown=True
-)
+# Provider limits and resilience, all overridable per model like
+# LLM_MAX_CONCURRENCY: requests/tokens per minute (0 disables a bucket),
+# the completion tokens each call reserves from the TPM bucket (capped at
+# the tier's max_tokens), retries with jittered exponential backoff, and
+# the circuit breaker.
+LLM_DEFAULTS = {
+    "LLM_RPM": 1000,
+    "LLM_TPM": 250000,
+    "LLM_OUTPUT_TOKEN_ESTIMATE": 1500,
+    "LLM_MAX_RETRIES": 3,
+    "LLM_RETRY_BASE_DELAY": 0.5,
+    "LLM_RETRY_MAX_DELAY": 8.0,
+    "LLM_BREAKER_FAILURES": 5,
+    "LLM_BREAKER_RESET": 30.0,
+}
 
-# ===== GENERAL AGENTS =====
-diet_agent = Agent(
-    model=Groq(id=MODEL),
-    description="fitness diet planner",
-    markdown=True
-)
 
-workout_agent = Agent(
-    model=Groq(id=MODEL),
-    description="fitness workout planner",
-    markdown=True
-)
+def model_config(model_id):
+    return {name: model_setting(name, model_id, default) for name, default in LLM_DEFAULTS.items()}
 
-mental_agent = Agent(
-    model=Groq(id=MODEL),
-    description="mental wellness coach",
-    markdown=True
-)
+
+_model_limits = {}
+
+def _model_limit(model_id):
+    limit = _model_limits.get(model_id)
+    if limit is None:
+        size = model_setting("LLM_MAX_CONCURRENCY", model_id, DEFAULT_MAX_CONCURRENCY)
+        limit = _model_limits[model_id] = asyncio.Semaphore(size)
+    return limit
+
+
+_model_guards = {}
+
+def model_guard(model_id):
+    guard = _model_guards.get(model_id)
+    if guard is None:
+        config = model_config(model_id)
+        guard = _model_guards[model_id] = ModelGuard(
+            rpm=config["LLM_RPM"],
+            tpm=config["LLM_TPM"],
+            max_retries=config["LLM_MAX_RETRIES"],
+            retry_base_delay=config["LLM_RETRY_BASE_DELAY"],
+            retry_max_delay=config["LLM_RETRY_MAX_DELAY"],
+            breaker_failures=config["LLM_BREAKER_FAILURES"],
+            breaker_reset=config["LLM_BREAKER_RESET"],
+        )
+    return guard
+
+
+def _request_tokens(task, prompt, tier):
+    config = MODEL_TIERS[tier]
+    output = model_setting("LLM_OUTPUT_TOKEN_ESTIMATE", config["model"], LLM_DEFAULTS["LLM_OUTPUT_TOKEN_ESTIMATE"])
+    return static_tokens(PROMPTS[task].system) + estimate_tokens(prompt) + min(output, config["max_tokens"])
+
+
+def resilience_snapshot():
+    return {model_id: guard.snapshot() for model_id, guard in _model_guards.items()}
+
+
+# ===== MODEL TIERS =====
+
+# Each task runs on a tier: a model plus completion size and timeout.
+# A tier with a fallback gives up on its model as soon as a call times
+# out, is rate limited or hits an open circuit, and reruns the request on
+# the fallback tier instead of retrying in place. Fallbacks on the same
+# model as the failing tier are skipped: they share its guard and quota,
+# so that tier retries in place instead. Every tier setting can be
+# overridden from the environment, e.g. LLM_TIER_MODEL__LONG,
+# LLM_TIER_MAX_TOKENS__FAST, LLM_TIER_TIMEOUT__STANDARD, and a task can
+# be moved with e.g. LLM_TIER__ADVICE=standard.
+
+def _tier(name, model, max_tokens, timeout, fallback=None):
+    return {
+        "model": model_setting("LLM_TIER_MODEL", name, model),
+        "max_tokens": model_setting("LLM_TIER_MAX_TOKENS", name, max_tokens),
+        "timeout": model_setting("LLM_TIER_TIMEOUT", name, timeout),
+        "fallback": fallback,
+    }
+
+
+MODEL_TIERS = {
+    "fast": _tier("fast", MODEL, 1500, 30.0),
+    "standard": _tier("standard", MODEL, 3000, 60.0, fallback="fast"),
+    "long": _tier("long", "llama-3.3-70b-versatile", 6000, 120.0, fallback="standard"),
+}
+
+TASK_TIERS = {
+    # single-topic guidance
+    "mental": "fast",
+    "what-if": "fast",
+    "sleep-analysis": "fast",
+    "nutrient-risk": "fast",
+    "mess-food": "fast",
+    "hostel-workout": "fast",
+    # long multi-section plans
+    "diet": "standard",
+    "workout": "standard",
+    "summary": "standard",
+    "protein": "standard",
+    "analyze": "standard",
+    "budget-meal": "standard",
+    # the "VERY LONG" personalised report
+    "advice": "long",
+    # short bookkeeping call behind incremental analysis
+    "rolling-summary": "fast",
+}
+
+# Attempts on a tier's own model before moving to its fallback.
+LLM_RETRIES_BEFORE_FALLBACK = int(os.getenv("LLM_RETRIES_BEFORE_FALLBACK", "0"))
+
+
+def task_tier(task):
+    tier = model_setting("LLM_TIER", task, TASK_TIERS.get(task, "standard"))
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"unknown model tier {tier!r} for task {task!r}")
+    return tier
+
+
+tier_latency = {tier: LatencyWindow() for tier in MODEL_TIERS}
+tier_fallbacks = {tier: 0 for tier in MODEL_TIERS}
+
+
+def tier_snapshot():
+    return {
+        tier: dict(
+            config,
+            tasks=[task for task in PROMPTS if task_tier(task) == tier],
+            fallbacks=tier_fallbacks[tier],
+            latency=tier_latency[tier].snapshot(),
+        )
+        for tier, config in MODEL_TIERS.items()
+    }
+
+
+# ===== AGENTS =====
+
+# agno and the Groq SDK take ~0.5s to import, so they are loaded on the
+# first agent build (or by warm_up() after startup), not at import time.
+
+def make_agent(prompt, tier="standard"):
+    config = MODEL_TIERS[tier]
+    if LLM_BACKEND == "fake":
+        from app.fake_llm import FakeAgent
+        return FakeAgent(prompt, config)
+
+    from agno.agent import Agent
+    from agno.models.groq import Groq
+
+    return Agent(
+        # Retries are handled by ModelGuard, not the SDK.
+        model=Groq(
+            id=config["model"],
+            max_tokens=config["max_tokens"],
+            timeout=config["timeout"],
+            http_client=get_http_client(),
+            max_retries=0,
+        ),
+        description=prompt.description,
+        instructions=prompt.system,
+        markdown=True
+    )
+
+
+class AgentPool:
+    """Bounded pool of identical agents, created on first use.
+
+    ``checkout()`` hands each caller an agent nobody else is running and
+    waits when all ``size`` agents are busy.
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self.created = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = None
+
+    @asynccontextmanager
+    async def checkout(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            with self._lock:
+                agent = self._idle.pop() if self._idle else None
+            if agent is None:
+                # Counted only once built, so a failing factory does not
+                # inflate "created" (and "in_use") for good.
+                agent = self.factory()
+                with self._lock:
+                    self.created += 1
+
+            try:
+                yield agent
+            finally:
+                with self._lock:
+                    self._idle.append(agent)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {"size": self.size, "created": self.created, "idle": idle, "in_use": self.created - idle}
+
+
+# One pool per task and tier, so each task's static instructions sit in
+# the system message ahead of the per-request input. Pools only build
+# agents when used, so fallback tiers cost nothing until needed.
+AGENT_POOLS = {
+    (name, tier): AgentPool(lambda prompt=prompt, tier=tier: make_agent(prompt, tier), AGENT_POOL_SIZE)
+    for name, prompt in PROMPTS.items()
+    for tier in MODEL_TIERS
+}
+
+
+def warm_up():
+    """Import the agent stack ahead of the first LLM request."""
+    if LLM_BACKEND == "fake":
+        return
+    import agno.agent  # noqa: F401
+    import agno.models.groq  # noqa: F401
+
+
+def agent_pool_snapshot():
+    return {f"{name}/{tier}": pool.stats() for (name, tier), pool in AGENT_POOLS.items() if pool.created}
+
+
+# ===== HEDGING =====
+
+# With LLM_HEDGE=1, a call still running after the
+# LLM_HEDGE_PERCENTILE-th percentile of recent latency for its agent
+# (task and tier) gets a duplicate; the first to succeed wins and the
+# other is cancelled. Hedges never wait on the rate limiter and are capped
+# at LLM_HEDGE_MAX_RATE of calls, so they only spend spare quota.
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.05"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+agent_latency = {key: LatencyWindow() for key in AGENT_POOLS}
+hedge_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "capped": 0}
+
+
+def hedge_delay(task, tier):
+    if not LLM_HEDGE:
+        return None
+    window = agent_latency[task, tier]
+    if len(window.samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return window.percentile(LLM_HEDGE_PERCENTILE)
+
+
+def _may_hedge(tier, tokens):
+    if hedge_stats["hedged"] >= LLM_HEDGE_MAX_RATE * hedge_stats["calls"]:
+        hedge_stats["capped"] += 1
+        return False
+    if not model_guard(MODEL_TIERS[tier]["model"]).try_admit(tokens):
+        hedge_stats["capped"] += 1
+        return False
+    return True
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000)
+
+
+def hedge_snapshot():
+    return dict(
+        hedge_stats,
+        enabled=LLM_HEDGE,
+        percentile=LLM_HEDGE_PERCENTILE,
+        max_rate=LLM_HEDGE_MAX_RATE,
+        agents={
+            f"{task}/{tier}": dict(window.snapshot(), hedge_after_ms=_ms(hedge_delay(task, tier)))
+            for (task, tier), window in agent_latency.items()
+            if window.counts["calls"]
+        },
+    )
+
+
+# ===== RUNNING =====
+
+@contextmanager
+def _llm_in_flight(task, tier):
+    labels = (role_label(task), tier)
+    LLM_IN_FLIGHT.inc(labels)
+    try:
+        yield
+    finally:
+        LLM_IN_FLIGHT.dec(labels)
+
+
+async def _call_agent(task, tier, prompt):
+    started = time.perf_counter()
+    try:
+        async with _model_limit(MODEL_TIERS[tier]["model"]), AGENT_POOLS[task, tier].checkout() as agent:
+            record_stage("queue_wait", time.perf_counter() - started, task)
+            with stage("llm_call", task), _llm_in_flight(task, tier):
+                response = await agent.arun(prompt)
+                content = getattr(response, "content", str(response))
+                # agno reports provider failures as an error run, not an exception.
+                if getattr(getattr(response, "status", None), "value", None) == "ERROR":
+                    raise error_from_message(str(content))
+    except Exception:
+        agent_latency[task, tier].record(time.perf_counter() - started, ok=False)
+        raise
+
+    agent_latency[task, tier].record(time.perf_counter() - started)
+    return content
+
+
+async def _hedged_call(task, tier, prompt):
+    hedge_stats["calls"] += 1
+    delay = hedge_delay(task, tier)
+    primary = asyncio.ensure_future(_call_agent(task, tier, prompt))
+    hedge = None
+    try:
+        if delay is not None:
+            await asyncio.wait({primary}, timeout=delay)
+        if primary.done() or delay is None or not _may_hedge(tier, _request_tokens(task, prompt, tier)):
+            return await primary
+
+        hedge_stats["hedged"] += 1
+        hedge = asyncio.ensure_future(_call_agent(task, tier, prompt))
+        legs = {primary, hedge}
+        while legs:
+            done, legs = await asyncio.wait(legs, return_when=asyncio.FIRST_COMPLETED)
+            for leg in done:
+                if leg.exception() is None:
+                    if leg is hedge:
+                        hedge_stats["hedge_wins"] += 1
+                    return leg.result()
+        return primary.result()  # both failed
+    finally:
+        for leg in (primary, hedge):
+            if leg is not None and not leg.done():
+                leg.cancel()
+
+
+async def _attempt(task, tier, prompt):
+    config = MODEL_TIERS[tier]
+    started = time.perf_counter()
+    try:
+        content = await asyncio.wait_for(_hedged_call(task, tier, prompt), config["timeout"])
+    except asyncio.TimeoutError:
+        tier_latency[tier].record(time.perf_counter() - started, ok=False)
+        raise LLMError(f"{tier} tier timed out after {config['timeout']:g}s", retryable=True)
+    except Exception:
+        tier_latency[tier].record(time.perf_counter() - started, ok=False)
+        raise
+
+    tier_latency[tier].record(time.perf_counter() - started)
+    return content
+
+
+def _fallback_tier(tier):
+    """The first fallback of ``tier`` on a different model, or None."""
+    model = MODEL_TIERS[tier]["model"]
+    fallback = MODEL_TIERS[tier]["fallback"]
+    while fallback is not None and MODEL_TIERS[fallback]["model"] == model:
+        fallback = MODEL_TIERS[fallback]["fallback"]
+    return fallback
+
+
+def _next_tier(tier, exc):
+    """The tier to rerun on after ``exc``, or None to give up."""
+    fallback = _fallback_tier(tier)
+    if fallback is None or not exc.retryable:
+        return None
+    tier_fallbacks[tier] += 1
+    return fallback
+
+
+def _tier_retries(tier):
+    return LLM_RETRIES_BEFORE_FALLBACK if _fallback_tier(tier) else None
+
+
+async def _run(task, prompt):
+    tier = task_tier(task)
+    while True:
+        guard = model_guard(MODEL_TIERS[tier]["model"])
+        try:
+            return await guard.call(
+                lambda: _attempt(task, tier, prompt),
+                _request_tokens(task, prompt, tier),
+                max_retries=_tier_retries(tier),
+            )
+        except LLMError as exc:
+            tier = _next_tier(tier, exc)
+            if tier is None:
+                raise
+
+
+# Identical (task, prompt) calls that overlap share one provider call.
+_in_flight = {}
+singleflight_stats = {"calls": 0, "coalesced": 0}
+
+
+def _forget_flight(key, future):
+    if _in_flight.get(key) is future:
+        del _in_flight[key]
+    if not future.cancelled():
+        future.exception()  # mark as retrieved when every waiter has gone away
+
+
+async def safe_run(task, prompt):
+    key = (task, prompt)
+    singleflight_stats["calls"] += 1
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_run(task, prompt))
+        _in_flight[key] = future
+        future.add_done_callback(lambda done: _forget_flight(key, done))
+    else:
+        singleflight_stats["coalesced"] += 1
+
+    # Shielded so one disconnecting caller doesn't cancel the shared call.
+    return await asyncio.shield(future)
+
+
+def singleflight_snapshot():
+    return dict(singleflight_stats, in_flight=len(_in_flight))
+
+
+# agno RunEvent values, compared as strings so streaming needs no agno import.
+RUN_CONTENT = "RunContent"
+RUN_ERROR = "RunError"
+
+
+async def _stream_tier(task, tier, prompt, parts):
+    config = MODEL_TIERS[tier]
+    guard = model_guard(config["model"])
+    guard.stats["calls"] += 1
+    tokens = _request_tokens(task, prompt, tier)
+    attempt = 0
+
+    while True:
+        trial = await guard.admit(tokens)
+        started = time.perf_counter()
+        try:
+            # The tier timeout bounds the wait for the first chunk only.
+            async with asyncio.timeout(config["timeout"]) as deadline:
+                async with _model_limit(config["model"]), AGENT_POOLS[task, tier].checkout() as agent:
+                    called = time.perf_counter()
+                    record_stage("queue_wait", called - started, task)
+                    with stage("llm_call", task), _llm_in_flight(task, tier):
+                        async for event in agent.arun(prompt, stream=True):
+                            kind = getattr(event, "event", None)
+                            if kind == RUN_ERROR:
+                                raise error_from_message(str(getattr(event, "content", "")))
+                            if kind != RUN_CONTENT:
+                                continue
+                            content = getattr(event, "content", None)
+                            if isinstance(content, str) and content:
+                                if deadline.when() is not None:
+                                    record_stage("llm_first_chunk", time.perf_counter() - called, task)
+                                    deadline.reschedule(None)
+                                parts.append(content)
+                                yield content
+        except Exception as exc:
+            tier_latency[tier].record(time.perf_counter() - started, ok=False)
+            if isinstance(exc, TimeoutError):
+                exc = LLMError(f"{tier} tier timed out after {config['timeout']:g}s", retryable=True)
+            if parts:
+                # Text already reached the client, so a retry can't be spliced in.
+                guard.release(trial)
+                raise as_llm_error(exc) from exc
+            await asyncio.sleep(guard.on_failure(exc, attempt, _tier_retries(tier)))
+            attempt += 1
+            continue
+        except BaseException:
+            # The client went away (generator closed or cancelled).
+            guard.release(trial)
+            raise
+
+        tier_latency[tier].record(time.perf_counter() - started)
+        guard.on_success()
+        return
+
+
+async def safe_stream(task, prompt, on_complete=None):
+    """Yield the completion in chunks as the model produces them.
+
+    ``on_complete`` receives the full text once the stream finishes, so
+    callers can cache or persist it exactly like a ``safe_run`` result.
+    """
+    parts = []
+    tier = task_tier(task)
+    while True:
+        try:
+            # aclosing: a client disconnect closes the tier stream right away.
+            async with aclosing(_stream_tier(task, tier, prompt, parts)) as chunks:
+                async for content in chunks:
+                    yield content
+        except LLMError as exc:
+            tier = None if parts else _next_tier(tier, exc)
+            if tier is None:
+                raise
+            continue
+        break
+
+    if on_complete is not None:
+        on_complete("".join(parts))
+
+
+# ===== METRICS =====
+
+def _counter(name, help, values):
+    return Family(name, "counter", help, [("", labels, value) for labels, value in values])
+
+
+def _collect_metrics():
+    agents = [(task, tier, window) for (task, tier), window in agent_latency.items() if window.counts["calls"]]
+    families = [
+        Family("llm_tier_duration_seconds", "histogram", "Successful LLM attempts per tier, hedges included", [
+            sample for tier, window in tier_latency.items() for sample in window_samples({"tier": tier}, window)
+        ]),
+        _counter("llm_tier_attempts_total", "LLM attempts per tier",
+                 [({"tier": tier}, window.counts["calls"]) for tier, window in tier_latency.items()]),
+        _counter("llm_tier_errors_total", "Failed or timed out LLM attempts per tier",
+                 [({"tier": tier}, window.counts["errors"]) for tier, window in tier_latency.items()]),
+        _counter("llm_tier_fallbacks_total", "Requests handed on to the fallback tier",
+                 [({"tier": tier}, count) for tier, count in tier_fallbacks.items()]),
+        Family("llm_agent_duration_seconds", "histogram", "Successful provider calls per task and tier", [
+            sample
+            for task, tier, window in agents
+            for sample in window_samples({"role": role_label(task), "task": task, "tier": tier}, window)
+        ]),
+        _counter("llm_agent_errors_total", "Failed provider calls per task and tier",
+                 [({"role": role_label(task), "task": task, "tier": tier}, window.counts["errors"])
+                  for task, tier, window in agents]),
+        Family("llm_singleflight_in_flight", "gauge", "Distinct LLM calls in flight", [("", {}, len(_in_flight))]),
+    ]
+    families += stats_families("llm_singleflight", "Single-flight", singleflight_stats, counters=("calls", "coalesced"))
+    families += stats_families("llm_hedge", "Hedging", hedge_stats, counters=("calls", "hedged", "hedge_wins", "capped"))
+
+    for model_id, guard in _model_guards.items():
+        labels = {"model": model_id}
+        families += stats_families(
+            "llm_guard", "Model guard", guard.stats,
+            counters=("calls", "retries", "failures", "rejected_open"), labels=labels,
+        )
+        families.append(Family("llm_breaker_open", "gauge", "1 while the model's circuit is open", [
+            ("", labels, guard.snapshot()["breaker_state"] == "open"),
+        ]))
+
+    for (task, tier), pool in AGENT_POOLS.items():
+        if pool.created:
+            families += stats_families(
+                "agent_pool", "Agent pool", pool.stats(),
+                gauges=("created", "idle", "in_use"), labels={"task": task, "tier": tier},
+            )
+    return families
+
+
+COLLECTORS.append(_collect_metrics)
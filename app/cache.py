@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.metrics import COLLECTORS, stats_families
+
+# Profile fields that never change the generated plan.
+COSMETIC_FIELDS = {"name"}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def canonical_profile(profile: dict):
+    canonical = {}
+    for key in sorted(profile):
+        if key in COSMETIC_FIELDS:
+            continue
+        value = profile[key]
+        if isinstance(value, str):
+            value = " ".join(value.split()).lower()
+        canonical[key] = value
+    return canonical
+
+
+general_cache = TTLCache(
+    maxsize=int(os.getenv("GENERAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GENERAL_CACHE_TTL", "3600")),
+)
+
+COLLECTORS.append(lambda: stats_families(
+    "general_cache", "General plan cache", general_cache.stats(), counters=("hits", "misses", "evictions"), gauges=("size",)
+))
+
+
+def profile_cache_key(endpoint: str, profile: dict, prompt_version: str):
+    """Key for ``profile``, which must already be canonical."""
+    return (endpoint, json.dumps(profile, sort_keys=True), prompt_version)
@@ -0,0 +1,118 @@
+import asyncio
+import enum
+import hashlib
+import os
+import random
+
+# LLM_BACKEND=fake replaces every Groq agent with FakeAgent: no network,
+# no API key. Replies are deterministic markdown derived from the prompt;
+# timing and failures are drawn from the distributions below.
+#
+#   FAKE_LLM_TTFT_MEDIAN / FAKE_LLM_TTFT_SIGMA   lognormal time to first token (s)
+#   FAKE_LLM_TOKENS_PER_SECOND                   generation speed after that
+#   FAKE_LLM_OUTPUT_TOKENS                       reply length (capped by the tier's max_tokens)
+#   FAKE_LLM_ERROR_RATE                          share of calls failing with a 429
+#   FAKE_LLM_STALL_RATE / FAKE_LLM_STALL_SECONDS share of calls that hang first
+#   FAKE_LLM_SEED                                seed for the timing/failure draws
+FAKE_LLM_TTFT_MEDIAN = float(os.getenv("FAKE_LLM_TTFT_MEDIAN", "0.3"))
+FAKE_LLM_TTFT_SIGMA = float(os.getenv("FAKE_LLM_TTFT_SIGMA", "0.5"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "500"))
+FAKE_LLM_OUTPUT_TOKENS = int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "400"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_STALL_RATE = float(os.getenv("FAKE_LLM_STALL_RATE", "0"))
+FAKE_LLM_STALL_SECONDS = float(os.getenv("FAKE_LLM_STALL_SECONDS", "30"))
+
+ERROR_MESSAGE = "Error code: 429 - Rate limit reached for model (fake backend)"
+CHUNK_WORDS = 8
+
+_rng = random.Random(os.getenv("FAKE_LLM_SEED"))
+
+_WORDS = (
+    "sleep energy protein hydration routine consistency recovery budget mess "
+    "breakfast focus stress walk stretch vegetables dal paneer eggs oats curd "
+    "fruit water schedule habit week target improve reduce maintain track"
+).split()
+
+
+class RunStatus(enum.Enum):
+    completed = "COMPLETED"
+    error = "ERROR"
+
+
+class FakeRunOutput:
+    def __init__(self, content, status=RunStatus.completed):
+        self.content = content
+        self.status = status
+
+
+class FakeEvent:
+    def __init__(self, event, content):
+        self.event = event
+        self.content = content
+
+
+class FakeModel:
+    def __init__(self, model_id, max_tokens):
+        self.id = model_id
+        self.max_tokens = max_tokens
+
+
+def fake_reply(task: str, prompt: str, tokens: int):
+    """Markdown of roughly ``tokens`` tokens, the same for the same prompt."""
+    rng = random.Random(hashlib.sha256(f"{task}\0{prompt}".encode("utf-8")).digest())
+    lines = [f"## {task.replace('-', ' ').title()}"]
+    words = 0
+    section = 0
+    while words * 4 // 3 < tokens:
+        section += 1
+        lines.append(f"\n### {section}. {rng.choice(_WORDS).title()} {rng.choice(_WORDS)}")
+        for _ in range(3):
+            bullet = [rng.choice(_WORDS) for _ in range(rng.randint(6, 12))]
+            lines.append("- " + " ".join(bullet).capitalize())
+            words += len(bullet) + 1
+    return "\n".join(lines)
+
+
+class FakeAgent:
+    """Stands in for an agno Agent: same ``arun`` calls, same result shapes."""
+
+    def __init__(self, prompt, tier_config):
+        self.task = prompt.name
+        self.description = prompt.description
+        self.model = FakeModel(f"fake/{tier_config['model']}", tier_config["max_tokens"])
+
+    def _draw(self):
+        first_token = _rng.lognormvariate(0, FAKE_LLM_TTFT_SIGMA) * FAKE_LLM_TTFT_MEDIAN
+        if _rng.random() < FAKE_LLM_STALL_RATE:
+            first_token += FAKE_LLM_STALL_SECONDS
+        return first_token, _rng.random() < FAKE_LLM_ERROR_RATE
+
+    def _reply(self, prompt):
+        return fake_reply(self.task, str(prompt), min(FAKE_LLM_OUTPUT_TOKENS, self.model.max_tokens))
+
+    def arun(self, prompt, stream=False):
+        return self._stream(prompt) if stream else self._complete(prompt)
+
+    async def _complete(self, prompt):
+        first_token, fails = self._draw()
+        await asyncio.sleep(first_token)
+        if fails:
+            return FakeRunOutput(ERROR_MESSAGE, RunStatus.error)
+
+        reply = self._reply(prompt)
+        await asyncio.sleep(len(reply.split()) * 4 / 3 / FAKE_LLM_TOKENS_PER_SECOND)
+        return FakeRunOutput(reply)
+
+    async def _stream(self, prompt):
+        first_token, fails = self._draw()
+        await asyncio.sleep(first_token)
+        if fails:
+            yield FakeEvent("RunError", ERROR_MESSAGE)
+            return
+
+        words = self._reply(prompt).split(" ")
+        for start in range(0, len(words), CHUNK_WORDS):
+            if start:
+                await asyncio.sleep(CHUNK_WORDS * 4 / 3 / FAKE_LLM_TOKENS_PER_SECOND)
+            chunk = " ".join(words[start:start + CHUNK_WORDS])
+            yield FakeEvent("RunContent", chunk if start + CHUNK_WORDS >= len(words) else chunk + " ")
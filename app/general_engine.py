@@ -1,199 +1,112 @@
-from app.ai_core import (
-    safe_run,
-    diet_agent,
-    workout_agent,
-    mental_agent,
-)
+import asyncio
+import time
 
-# ============================================================
-# 🥗 GENERATE CUSTOMIZED DIET PLAN
-# ============================================================
-
-def generate_diet(profile: dict):
-    prompt = f"""
-🥗 CUSTOMIZED DIET PLAN
-============================================================
+from app.ai_core import safe_run, safe_stream
+from app.cache import general_cache, canonical_profile, profile_cache_key
+from app.metrics import stage
+from app.prompt_format import format_profile, count_prompt
+from app.prompts import PROMPTS
 
-USER PROFILE:
-{profile}
+GENERAL_TASKS = ("diet", "workout", "summary", "mental", "protein", "what-if")
 
-You are a Professional Fitness Nutritionist.
 
-Generate a LONG, DETAILED, PRACTICAL diet plan including:
+def render_general_prompt(task: str, profile: dict):
+    prompt = PROMPTS[task]
+    with stage("prompt_build", task):
+        return count_prompt(task, prompt.render(profile=format_profile(profile)), prompt.system)
 
-### 1. Nutrition Goal Explanation
-- Explain goal relevance (fat loss / muscle gain / endurance)
 
-### 2. Daily Meal Structure
-- Breakfast
-- Lunch
-- Dinner
-- Snacks
+async def run_general(task: str, profile: dict):
+    profile = canonical_profile(profile)
+    key = profile_cache_key(task, profile, PROMPTS[task].version)
 
-### 3. Food Choices (Indian Context)
-- Veg and non-veg options
-- Portion guidance
-- Affordable substitutions
+    result = general_cache.get(key)
+    if result is None:
+        result = await safe_run(task, render_general_prompt(task, profile))
+        general_cache.set(key, result)
+    return result
 
-### 4. Weekly Meal Plan (Sample)
-- Day-wise suggestions
 
-### 5. Hydration & Micronutrients
-- Water intake
-- Fruits & vegetables
+async def stream_general(task: str, profile: dict):
+    profile = canonical_profile(profile)
+    key = profile_cache_key(task, profile, PROMPTS[task].version)
 
-### 6. Common Mistakes to Avoid
-### 7. Sustainability Tips
+    result = general_cache.get(key)
+    if result is not None:
+        yield result
+        return
 
-Use markdown headings, bullet points, and friendly tone.
-Avoid medical claims.
-"""
-    return safe_run(diet_agent, prompt)
+    prompt = render_general_prompt(task, profile)
+    async for chunk in safe_stream(task, prompt, lambda text: general_cache.set(key, text)):
+        yield chunk
 
 
-# ============================================================
-# 🏋️ GENERATE CUSTOMIZED WORKOUT PLAN
-# ============================================================
+async def generate_full_plan(profile: dict):
+    """Run every general task concurrently, yielding sections as they finish."""
 
-def generate_workout(profile: dict):
-    prompt = f"""
-🏋️ CUSTOMIZED WORKOUT PLAN
-============================================================
+    async def timed(task):
+        started = time.perf_counter()
+        section = {"section": task}
+        try:
+            section["content"] = await run_general(task, profile)
+        except Exception as exc:
+            section["error"] = str(exc)
+        section["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return section
 
-USER PROFILE:
-{profile}
+    pending = [asyncio.ensure_future(timed(task)) for task in GENERAL_TASKS]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in pending:
+            task.cancel()
 
-You are a Certified Fitness Trainer.
 
-Generate a LONG, DETAILED workout plan including:
+# ============================================================
+# 🥗 GENERATE CUSTOMIZED DIET PLAN
+# ============================================================
 
-### 1. Fitness Goal Alignment
-### 2. Weekly Workout Split
-- Strength days
-- Cardio days
-- Rest days
+async def generate_diet(profile: dict):
+    return await run_general("diet", profile)
 
-### 3. Exercise Selection
-- Beginner-friendly
-- No-equipment / gym alternatives
 
-### 4. Sets, Reps & Intensity
-### 5. Recovery & Mobility
-### 6. Safety & Injury Prevention
+# ============================================================
+# 🏋️ GENERATE CUSTOMIZED WORKOUT PLAN
+# ============================================================
 
-Use clear structure and motivational tone.
-"""
-    return safe_run(workout_agent, prompt)
+async def generate_workout(profile: dict):
+    return await run_general("workout", profile)
 
 
 # ============================================================
 # 💪 COMPLETE HEALTH SUMMARY (DIET + WORKOUT)
 # ============================================================
 
-def generate_health_summary(profile: dict):
-    prompt = f"""
-📊 COMPLETE HEALTH SUMMARY
-============================================================
-
-USER PROFILE:
-{profile}
-
-Provide a LONG, HOLISTIC health overview including:
-
-### 1. BMI & Body Composition Interpretation
-### 2. Strengths & Positive Habits
-### 3. Current Health Risks
-### 4. Diet Improvement Focus Areas
-### 5. Workout Improvement Focus Areas
-### 6. 30-Day Action Plan
-
-Use encouraging, coach-style language.
-"""
-    return safe_run(diet_agent, prompt)
+async def generate_health_summary(profile: dict):
+    return await run_general("summary", profile)
 
 
 # ============================================================
 # 🧠 MENTAL WELLNESS SUPPORT
 # ============================================================
 
-def mental_wellness_support(profile: dict):
-    prompt = f"""
-🧠 MENTAL WELLNESS SUPPORT
-============================================================
-
-USER PROFILE:
-{profile}
-
-You are a Mental Wellness Coach.
-
-Provide a DETAILED response including:
-
-### 1. Common Stress Sources
-### 2. Mental Health Risks
-### 3. Daily Stress-Reduction Techniques
-### 4. Mindfulness & Focus Practices
-### 5. Motivation & Consistency Tips
-### 6. When to Seek Professional Help
-
-Keep the tone supportive and non-clinical.
-"""
-    return safe_run(mental_agent, prompt)
+async def mental_wellness_support(profile: dict):
+    return await run_general("mental", profile)
 
 
 # ============================================================
 # 🥩 PROTEIN PLANNING
 # ============================================================
 
-def protein_planning(profile: dict):
-    prompt = f"""
-🥩 PROTEIN PLANNING GUIDE
-============================================================
-
-USER PROFILE:
-{profile}
-
-Generate a LONG, DETAILED protein guide including:
-
-### 1. Daily Protein Requirement
-### 2. Veg Protein Sources
-### 3. Non-Veg Protein Sources
-### 4. Budget-Friendly Options
-### 5. Protein Timing
-### 6. Common Myths & Mistakes
-
-Use Indian food examples.
-"""
-    return safe_run(diet_agent, prompt)
+async def protein_planning(profile: dict):
+    return await run_general("protein", profile)
 
 
 # ============================================================
 # 🔮 WHAT-IF SIMULATION
 # ============================================================
 
-def what_if_simulation(profile: dict):
-    prompt = f"""
-🔮 WHAT-IF HEALTH SIMULATION
-============================================================
-
-USER PROFILE:
-{profile}
-
-Simulate outcomes if the user:
-
-### 1. Improves Diet Consistency
-### 2. Exercises 4–5 Days/Week
-### 3. Sleeps 7–8 Hours Daily
-
-For each scenario:
-- Physical changes
-- Mental changes
-- Energy & productivity
-
-Predict outcomes after:
-- 2 weeks
-- 1 month
-- 3 months
+async def what_if_simulation(profile: dict):
+    return await run_general("what-if", profile)
 
-Use realistic expectations and motivating tone.
-"""
-    return safe_run(workout_agent, prompt)
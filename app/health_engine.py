@@ -1,277 +1,156 @@
-from app.ai_core import (
-    safe_run,
-    student_health_agent,
-    sleep_analyzer_agent,
-    nutrient_risk_agent,
-    student_advisor_agent,
-    mess_food_agent,
-    budget_meal_agent,
+import asyncio
+import time
+
+from app.ai_core import safe_run, safe_stream
+from app.log_stats import compute_log_stats, format_log_stats
+from app.metrics import stage
+from app.prompt_format import count_prompt, format_logs, format_profile, fit_logs_to_budget
+from app.prompts import PROMPTS
+
+STUDENT_TASKS = (
+    "analyze",
+    "sleep-analysis",
+    "nutrient-risk",
+    "advice",
+    "budget-meal",
+    "mess-food",
+    "hostel-workout",
 )
 
-# ============================================================
-# ⚠️ COMPREHENSIVE STUDENT HEALTH RISK ANALYSIS
-# ============================================================
 
-def analyze_student_health(profile: dict, logs: list):
-    prompt = f"""
-⚠️ COMPREHENSIVE STUDENT HEALTH RISK ANALYSIS
-============================================================
+def render_student_prompt(task: str, profile: dict, logs: list, stats=None):
+    prompt = PROMPTS[task]
+    with stage("prompt_build", task):
+        if stats is None:
+            stats = compute_log_stats(logs)
 
-STUDENT PROFILE:
-{profile}
+        profile_text = format_profile(profile)
+        stats_text = format_log_stats(stats)
+        return fit_logs_to_budget(
+            task,
+            lambda logs_text: prompt.render(profile=profile_text, logs=logs_text, stats=stats_text),
+            logs,
+            prompt.system,
+        )
 
-RECENT HEALTH LOGS:
-{logs}
 
-You are an expert College Student Health Risk Analyst.
+async def run_student(task: str, profile: dict, logs: list, stats=None):
+    return await safe_run(task, render_student_prompt(task, profile, logs, stats))
 
-Generate a LONG, DETAILED report including:
 
-### 1. Overall Health Risk Overview
-- Physical health risks
-- Mental health risks
-- Lifestyle imbalance indicators
+async def stream_student(task: str, profile: dict, logs: list, on_complete=None, stats=None):
+    prompt = render_student_prompt(task, profile, logs, stats)
+    async for chunk in safe_stream(task, prompt, on_complete):
+        yield chunk
 
-### 2. Lifestyle Risk Factors
-- Sleep patterns
-- Junk food frequency
-- Energy levels
-- Budget constraints
 
-### 3. Academic Performance Impact
-- Focus
-- Memory
-- Exam performance
-- Burnout risk
+def render_incremental_prompt(task: str, profile: dict, summary, new_logs: list, stats):
+    """Like render_student_prompt, with the rolling summary standing in for old logs."""
+    prompt = PROMPTS[task]
+    with stage("prompt_build", task):
+        profile_text = format_profile(profile)
+        stats_text = format_log_stats(stats)
+        history = summary or "No earlier history."
+        return fit_logs_to_budget(
+            task,
+            lambda logs_text: prompt.render(
+                profile=profile_text,
+                logs=f"Earlier history (rolling summary):\n{history}\n\nNew since last analysis:\n{logs_text}",
+                stats=stats_text,
+            ),
+            new_logs,
+            prompt.system,
+        )
 
-### 4. Short-Term Risks (Next 3–6 months)
-### 5. Long-Term Risks (If habits continue)
 
-### 6. Practical, Hostel-Friendly Improvements
-- Daily habits
-- Study-life balance
-- Affordable fixes
+async def run_student_incremental(task: str, profile: dict, summary, new_logs: list, stats):
+    return await safe_run(task, render_incremental_prompt(task, profile, summary, new_logs, stats))
 
-### 7. Warning Signs & When to Seek Help
 
-Use Indian college context.
-Use bullet points and headings.
-Avoid medical diagnosis.
-"""
-    return safe_run(student_health_agent, prompt)
+async def update_rolling_summary(summary, new_logs: list):
+    prompt = PROMPTS["rolling-summary"]
+    with stage("prompt_build", "rolling-summary"):
+        rendered = prompt.render(summary=summary or "None yet.", logs=format_logs(new_logs))
+        rendered = count_prompt("rolling-summary", rendered, prompt.system)
+    return await safe_run("rolling-summary", rendered)
 
 
-# ============================================================
-# 😴 SLEEP PATTERN ANALYSIS
-# ============================================================
+async def generate_student_report(profile: dict, logs: list, stored=None, stats=None):
+    """Run every student analysis concurrently over one profile/log payload.
 
-def analyze_sleep_patterns(profile: dict, logs: list):
-    prompt = f"""
-😴 SLEEP PATTERN ANALYSIS FOR COLLEGE STUDENT
-============================================================
+    Sections found in ``stored`` (task -> text) are returned as is.
+    """
+    if stats is None:
+        stats = compute_log_stats(logs)
+    stored = stored or {}
 
-STUDENT PROFILE:
-{profile}
+    async def timed(task):
+        started = time.perf_counter()
+        section = {"section": task}
+        if task in stored:
+            return dict(section, content=stored[task], stored=True, elapsed_ms=0.0)
+        try:
+            section["content"] = await run_student(task, profile, logs, stats)
+        except Exception as exc:
+            section["error"] = str(exc)
+        section["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return section
 
-SLEEP DATA:
-{logs}
-
-Analyze in detail:
-
-### 1. Average Sleep Duration
-### 2. Sleep Consistency vs Irregularity
-### 3. Sleep Debt Accumulation
-### 4. Impact on Energy, Mood & Focus
-### 5. Hostel-Specific Sleep Challenges
-### 6. 7-Day Sleep Improvement Plan
-### 7. Red Flags & When to Seek Help
-
-Use practical, student-friendly language.
-Avoid medical diagnosis.
-"""
-    return safe_run(sleep_analyzer_agent, prompt)
+    return await asyncio.gather(*(timed(task) for task in STUDENT_TASKS))
 
 
 # ============================================================
-# 🔬 NUTRIENT DEFICIENCY RISK ASSESSMENT
+# ⚠️ COMPREHENSIVE STUDENT HEALTH RISK ANALYSIS
 # ============================================================
 
-def analyze_nutrient_deficiency(profile: dict, logs: list):
-    prompt = f"""
-🔬 NUTRIENT DEFICIENCY RISK ASSESSMENT
-============================================================
+async def analyze_student_health(profile: dict, logs: list):
+    return await run_student("analyze", profile, logs)
 
-STUDENT PROFILE:
-{profile}
 
-RECENT HEALTH LOGS:
-{logs}
+# ============================================================
+# 😴 SLEEP PATTERN ANALYSIS
+# ============================================================
 
-Analyze the risk of deficiencies for:
+async def analyze_sleep_patterns(profile: dict, logs: list):
+    return await run_student("sleep-analysis", profile, logs)
 
-### Protein
-### Iron
-### Vitamin B12
-### Vitamin D
-### Calcium
-### Fiber
 
-For EACH nutrient:
-- Risk Level (Low / Moderate / High)
-- Why this risk exists
-- Common symptoms to watch
-- Budget-friendly Indian food sources
-- Hostel-friendly options
+# ============================================================
+# 🔬 NUTRIENT DEFICIENCY RISK ASSESSMENT
+# ============================================================
 
-Do NOT diagnose.
-Focus on risk awareness and food-based improvements.
-"""
-    return safe_run(nutrient_risk_agent, prompt)
+async def analyze_nutrient_deficiency(profile: dict, logs: list):
+    return await run_student("nutrient-risk", profile, logs)
 
 
 # ============================================================
 # 💡 PERSONALIZED STUDENT ADVICE
 # ============================================================
 
-def generate_personalized_student_advice(profile: dict, logs: list):
-    prompt = f"""
-💡 PERSONALIZED STUDENT ADVICE
-============================================================
-**Comprehensive College Student Advice**
-
-STUDENT PROFILE:
-{profile}
-
-RECENT LOGS:
-{logs}
-
-You are a Senior College Lifestyle & Wellness Mentor.
-
-Generate a VERY LONG, STRUCTURED response with:
-
-### 1. Academic Success (3 Year Specific)
-- Semester-wise study schedule (table)
-- Exam preparation strategies
-- Time management techniques
-
-### 2. Budget Healthy Eating (₹200–400/week)
-- Weekly shopping list with prices
-- Hostel meal preparation tips
-- Snack planning
-
-### 3. Hostel Room Fitness
-- 15-minute daily routines
-- Study break exercises
-- Using hostel furniture safely
-
-### 4. Stress Management
-- Academic stress sources
-- Relaxation techniques
-- Social life balance
-
-### 5. Health Monitoring
-- Warning signs to watch
-- Campus health resources
-- When to seek professional help
-
-### Additional Tips
-- Journaling
-- Habit tracking
-- Motivation & consistency
-
-Use markdown tables, bullet points, and headings.
-Use encouraging, student-friendly tone.
-Avoid medical diagnosis.
-"""
-    return safe_run(student_advisor_agent, prompt)
+async def generate_personalized_student_advice(profile: dict, logs: list):
+    return await run_student("advice", profile, logs)
 
 
 # ============================================================
 # 🥗 BUDGET MEAL PLAN
 # ============================================================
 
-def generate_budget_meal_plan(profile: dict, logs: list):
-    prompt = f"""
-🥗 BUDGET MEAL PLAN FOR HOSTEL STUDENT
-============================================================
-
-STUDENT PROFILE:
-{profile}
-
-RECENT LOGS:
-{logs}
-
-Create a LONG, PRACTICAL plan including:
-
-### Weekly Budget Breakdown (₹200–400)
-### Weekly Shopping List with Prices
-### Breakfast Options
-### Lunch Options
-### Dinner Options
-### Mess Food Optimization
-### Study Snacks
-### Money-Saving Tips
-
-Assume limited cooking facilities.
-Use realistic Indian prices.
-"""
-    return safe_run(budget_meal_agent, prompt)
+async def generate_budget_meal_plan(profile: dict, logs: list):
+    return await run_student("budget-meal", profile, logs)
 
 
 # ============================================================
 # 🍽️ MESS FOOD OPTIMIZATION
 # ============================================================
 
-def analyze_mess_food(profile: dict, logs: list):
-    prompt = f"""
-🍽️ MESS FOOD OPTIMIZATION GUIDE
-============================================================
-
-STUDENT PROFILE:
-{profile}
-
-EATING PATTERNS:
-{logs}
-
-Provide detailed guidance on:
-
-### Best Mess Food Choices
-### Nutrient Pairing Strategies
-### Junk Food Alternatives
-### Budget Supplements
-### Weekend & Eating-Out Strategy
-
-Focus on Indian hostel mess context.
-Be extremely practical and realistic.
-"""
-    return safe_run(mess_food_agent, prompt)
+async def analyze_mess_food(profile: dict, logs: list):
+    return await run_student("mess-food", profile, logs)
 
 
 # ============================================================
 # 🏋️ HOSTEL ROOM WORKOUT PLAN
 # ============================================================
 
-def generate_hostel_room_workout(profile: dict, logs: list):
-    prompt = f"""
-🏋️ HOSTEL ROOM WORKOUT PLAN
-============================================================
-
-STUDENT PROFILE:
-{profile}
-
-RECENT LOGS:
-{logs}
-
-Generate a detailed plan including:
-
-### 15-Minute Daily Workout Routine
-### Quiet Room-Friendly Exercises
-### Study Break Movements
-### Weekly Frequency Plan
-### Safety Guidelines
+async def generate_hostel_room_workout(profile: dict, logs: list):
+    return await run_student("hostel-workout", profile, logs)
 
-No equipment.
-Small room.
-Student-safe intensity.
-"""
-    return safe_run(student_health_agent, prompt)
@@ -0,0 +1,111 @@
+import importlib.util
+import os
+import weakref
+
+import httpx
+
+from app.metrics import COLLECTORS, Family, stats_families
+
+# One keep-alive connection pool shared by every Groq model instance.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+# HTTP/2 needs the optional h2 package.
+HTTP2_ENABLED = os.getenv("HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+http_stats = {
+    "requests": 0,
+    "in_flight": 0,
+    "peak_in_flight": 0,
+    "connections_opened": 0,
+    "http2_requests": 0,
+    "errors": 0,
+}
+
+_seen_streams = weakref.WeakSet()
+_client = None
+
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """Counts requests and how many of them opened a new connection."""
+
+    async def handle_async_request(self, request):
+        http_stats["requests"] += 1
+        http_stats["in_flight"] += 1
+        http_stats["peak_in_flight"] = max(http_stats["peak_in_flight"], http_stats["in_flight"])
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            http_stats["errors"] += 1
+            raise
+        finally:
+            http_stats["in_flight"] -= 1
+
+        stream = response.extensions.get("network_stream")
+        if stream is not None and stream not in _seen_streams:
+            _seen_streams.add(stream)
+            http_stats["connections_opened"] += 1
+        if response.extensions.get("http_version") == b"HTTP/2":
+            http_stats["http2_requests"] += 1
+        return response
+
+    def pool_stats(self):
+        connections = self._pool.connections
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "open": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "utilization": round((len(connections) - idle) / HTTP_MAX_CONNECTIONS, 4),
+        }
+
+
+def get_http_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            transport=MeteredTransport(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            ),
+            timeout=HTTP_TIMEOUT,
+        )
+    return _client
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def http_pool_snapshot():
+    snapshot = dict(http_stats, http2_enabled=HTTP2_ENABLED)
+    snapshot["reused_requests"] = max(0, http_stats["requests"] - http_stats["errors"] - http_stats["connections_opened"])
+    if _client is not None and not _client.is_closed:
+        snapshot["pool"] = _client._transport.pool_stats()
+    return snapshot
+
+
+def _collect_metrics():
+    snapshot = http_pool_snapshot()
+    families = stats_families(
+        "llm_http", "Provider HTTP", snapshot,
+        counters=("requests", "errors", "connections_opened", "http2_requests"), gauges=("in_flight",),
+    )
+    if "pool" in snapshot:
+        families.append(Family("llm_http_connections", "gauge", "Provider HTTP: pooled connections", [
+            ("", {"state": "active"}, snapshot["pool"]["active"]),
+            ("", {"state": "idle"}, snapshot["pool"]["idle"]),
+        ]))
+    return families
+
+
+COLLECTORS.append(_collect_metrics)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.db import SessionLocal
+from app.health_engine import run_student_incremental, update_rolling_summary
+from app.jobs import JOB_HANDLERS, job_queue
+from app.log_stats import compute_log_stats
+from app.metrics import stage
+from app.models import Job, Student, StudentSummary
+from app.students import load_log_history, load_logs_after, student_profile
+
+logger = logging.getLogger(__name__)
+
+# At most this many new logs go into one incremental prompt. A longer
+# backlog (e.g. a student's first incremental run) is folded into the
+# summary in batches of this size by a background job; until it is done,
+# requests are answered from the summary plus the newest logs.
+SUMMARY_BATCH = int(os.getenv("SUMMARY_BATCH", "30"))
+FOLD_KIND = "student/fold-summary"
+
+
+# ===== SUMMARIES =====
+
+async def _load_summary(db, student_id):
+    row = await db.get(StudentSummary, student_id, populate_existing=True)
+    if row is None:
+        return None, 0, 0
+    return row.summary, row.last_log_id or 0, row.logs_summarized or 0
+
+
+async def _save_summary(db, student_id, previous_log_id, summary, last_log_id, logs_summarized):
+    """Store the summary unless another run advanced it first; returns success."""
+    values = {
+        "summary": summary,
+        "last_log_id": last_log_id,
+        "logs_summarized": logs_summarized,
+        "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+    if previous_log_id == 0:
+        db.add(StudentSummary(student_id=student_id, **values))
+        try:
+            await db.commit()
+            return True
+        except IntegrityError:
+            await db.rollback()
+            return False
+
+    result = await db.execute(
+        update(StudentSummary)
+        .where(StudentSummary.student_id == student_id, StudentSummary.last_log_id == previous_log_id)
+        .values(**values)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+# ===== BACKLOG =====
+
+async def _fold_backlog(params):
+    """Summarise old logs until at most SUMMARY_BATCH remain unsummarised."""
+    student_id = params["student_id"]
+    while True:
+        async with SessionLocal() as db:
+            summary, after_id, covered = await _load_summary(db, student_id)
+            new_logs = await load_logs_after(db, student_id, after_id, SUMMARY_BATCH + 1)
+        if len(new_logs) <= SUMMARY_BATCH:
+            return {"logs_summarized": covered}
+
+        # No session is held while the LLM runs.
+        batch = new_logs[:SUMMARY_BATCH]
+        summary = await update_rolling_summary(summary, batch)
+        async with SessionLocal() as db:
+            await _save_summary(db, student_id, after_id, summary, batch[-1]["id"], covered + len(batch))
+
+
+JOB_HANDLERS[FOLD_KIND] = _fold_backlog
+
+
+async def _queue_fold(db, student_id):
+    queued = await db.scalar(
+        select(Job.id)
+        .where(Job.student_id == student_id, Job.kind == FOLD_KIND, Job.status.in_(("pending", "running")))
+        .limit(1)
+    )
+    if queued is None:
+        await job_queue.submit(db, FOLD_KIND, {"student_id": student_id}, student_id=student_id)
+
+
+# ===== ANALYSIS =====
+
+async def _summary_update(summary, new_logs):
+    try:
+        return await update_rolling_summary(summary, new_logs)
+    except Exception:
+        logger.warning("rolling summary update failed; will retry on the next run", exc_info=True)
+        return None
+
+
+async def run_incremental_analysis(task: str, student_id: str):
+    """Analyse from the rolling summary plus logs since the last run.
+
+    The prompt holds the summary, at most SUMMARY_BATCH new logs and
+    whole-history statistics, so its size does not grow with history.
+    A longer backlog is queued for folding and only its newest
+    SUMMARY_BATCH logs are shown. Returns None when the student does not
+    exist.
+    """
+    async with SessionLocal() as db:
+        with stage("db_fetch"):
+            student = await db.get(Student, student_id)
+            if student is None:
+                return None
+            profile = student_profile(student)
+            summary, after_id, covered = await _load_summary(db, student_id)
+            new_logs = await load_logs_after(db, student_id, after_id, SUMMARY_BATCH + 1, newest=True)
+            history = await load_log_history(db, student_id)
+        backlog = len(new_logs) > SUMMARY_BATCH
+        if backlog:
+            new_logs = new_logs[1:]
+            await _queue_fold(db, student_id)
+    stats = compute_log_stats(history)
+
+    # Behind a backlog the new logs do not follow on from the summary, so
+    # only the fold job advances it.
+    analysis, new_summary = await asyncio.gather(
+        run_student_incremental(task, profile, summary, new_logs, stats),
+        _summary_update(summary, new_logs) if new_logs and not backlog else asyncio.sleep(0),
+        return_exceptions=True,
+    )
+
+    if isinstance(new_summary, str) and new_summary:
+        with stage("db_write"):
+            async with SessionLocal() as db:
+                await _save_summary(db, student_id, after_id, new_summary, new_logs[-1]["id"], covered + len(new_logs))
+    if isinstance(analysis, BaseException):
+        raise analysis
+    return analysis
+
+
+async def summary_view(db, student_id: str):
+    summary, last_log_id, covered = await _load_summary(db, student_id)
+    return {"summary": summary, "last_log_id": last_log_id or None, "logs_summarized": covered}
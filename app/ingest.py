@@ -0,0 +1,92 @@
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+
+from app.models import Student, HealthLog
+from app.schemas import HealthLogCreate
+
+# Rows per INSERT ... executemany / transaction.
+BULK_BATCH_SIZE = 5000
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def iter_bulk_records(request):
+    """Yield (index, record) from a JSON array or a streamed NDJSON body.
+
+    A line that is not valid JSON is yielded as a ``ValueError`` so the
+    caller can reject just that row.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type not in NDJSON_TYPES:
+        body = await request.json()
+        if not isinstance(body, list):
+            raise ValueError("Expected a JSON array of health logs")
+        for index, record in enumerate(body):
+            yield index, record
+        return
+
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_line(line)
+                index += 1
+
+    if buffer.strip():
+        yield index, _parse_line(buffer)
+
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return ValueError(f"Invalid JSON: {exc}")
+
+
+def validate_record(record):
+    """Return (row, None) for a valid log or (None, error message)."""
+    if isinstance(record, ValueError):
+        return None, str(record)
+    if not isinstance(record, dict):
+        return None, "Expected a JSON object"
+
+    try:
+        log = HealthLogCreate(**record)
+    except ValidationError as exc:
+        return None, "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in exc.errors()
+        )
+    return log.dict(), None
+
+
+async def insert_health_log_batch(db, batch, known_students):
+    """Insert the valid rows of ``batch`` in one transaction.
+
+    ``batch`` is a list of (index, row); returns the per-row results.
+    ``known_students`` caches student ids already confirmed to exist.
+    """
+    unknown = {row["student_id"] for _, row in batch} - known_students
+    if unknown:
+        found = await db.scalars(select(Student.id).where(Student.id.in_(unknown)))
+        known_students.update(found)
+
+    rows = []
+    results = []
+    for index, row in batch:
+        if row["student_id"] in known_students:
+            rows.append(row)
+            results.append({"index": index, "status": "accepted"})
+        else:
+            results.append({"index": index, "status": "rejected", "error": "Unknown student_id"})
+
+    if rows:
+        await db.execute(insert(HealthLog), rows)
+    await db.commit()
+    return results
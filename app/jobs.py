@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update
+
+from app.db import SessionLocal
+from app.general_engine import GENERAL_TASKS, run_general
+from app.health_engine import STUDENT_TASKS, generate_student_report, run_student
+from app.metrics import COLLECTORS, Family, label_context, stats_families
+from app.models import Job
+from app.students import load_student_context
+
+logger = logging.getLogger(__name__)
+
+# Jobs run on JOB_WORKERS background workers, so at most that many run at
+# once. Jobs left pending or running by a stopped process are picked up
+# again on start-up, up to JOB_MAX_ATTEMPTS runs each.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+class JobError(Exception):
+    pass
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ===== HANDLERS =====
+
+async def _student_context(params):
+    async with SessionLocal() as db:
+        context = await load_student_context(db, params["student_id"])
+    if context is None:
+        raise JobError("Student not found")
+    return context
+
+
+def _student_handler(task):
+    async def handler(params):
+        profile, logs, stats = await _student_context(params)
+        return {"analysis": await run_student(task, profile, logs, stats)}
+    return handler
+
+
+def _general_handler(task):
+    async def handler(params):
+        return {"result": await run_general(task, params["profile"])}
+    return handler
+
+
+async def _student_report(params):
+    profile, logs, stats = await _student_context(params)
+    return {"sections": await generate_student_report(profile, logs, stats=stats)}
+
+
+JOB_HANDLERS = {
+    **{f"student/{task}": _student_handler(task) for task in STUDENT_TASKS},
+    "student/report": _student_report,
+    **{f"general/{task}": _general_handler(task) for task in GENERAL_TASKS},
+}
+
+
+def job_view(job: Job):
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+# ===== QUEUE =====
+
+class JobQueue:
+    """Persistent job queue: rows in the ``jobs`` table, ids on an asyncio queue."""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = workers
+        self.stats = {"submitted": 0, "recovered": 0, "done": 0, "failed": 0, "running": 0}
+        self._queue = None
+        self._tasks = []
+        self._writes = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+
+        async with SessionLocal() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.attempts >= JOB_MAX_ATTEMPTS)
+                .values(status="failed", error="interrupted too many times", finished_at=_now())
+            )
+            stale = (
+                await db.scalars(
+                    select(Job.id)
+                    .where(Job.status.in_(("pending", "running")))
+                    .order_by(Job.created_at)
+                )
+            ).all()
+            await db.execute(update(Job).where(Job.id.in_(stale)).values(status="pending"))
+            await db.commit()
+
+        for job_id in stale:
+            self._queue.put_nowait(job_id)
+        if stale:
+            self.stats["recovered"] += len(stale)
+            logger.info("requeued %d unfinished job(s)", len(stale))
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # Interrupted jobs stay "running" in the DB and are rerun on start.
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Let results that were already computed reach the DB.
+        await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def submit(self, db, kind: str, params: dict, student_id=None):
+        if kind not in JOB_HANDLERS:
+            raise JobError(f"unknown job kind {kind!r}")
+
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            student_id=student_id,
+            params=json.dumps(params),
+            status="pending",
+            attempts=0,
+            created_at=_now(),
+        )
+        db.add(job)
+        await db.commit()
+
+        self.stats["submitted"] += 1
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception:
+                logger.exception("job %s could not be recorded", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id):
+        async with SessionLocal() as db:
+            job = await db.get(Job, job_id)
+            if job is None or job.status != "pending":
+                return
+            job.status = "running"
+            job.started_at = _now()
+            job.attempts += 1
+            await db.commit()
+            kind, params = job.kind, json.loads(job.params)
+
+        # No session is held while the LLM runs.
+        label_context(f"job:{kind}")
+        self.stats["running"] += 1
+        try:
+            result = await JOB_HANDLERS[kind](params)
+        except Exception as exc:
+            values = {"status": "failed", "error": str(exc) or type(exc).__name__}
+        else:
+            values = {"status": "done", "result": json.dumps(result)}
+        finally:
+            self.stats["running"] -= 1
+
+        write = asyncio.ensure_future(self._finish(job_id, values))
+        self._writes.add(write)
+        write.add_done_callback(self._writes.discard)
+        await asyncio.shield(write)
+
+    async def _finish(self, job_id, values):
+        async with SessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(finished_at=_now(), **values))
+            await db.commit()
+        self.stats[values["status"]] += 1
+
+    def snapshot(self):
+        return dict(self.stats, workers=self.workers, queued=self._queue.qsize() if self._queue else 0)
+
+
+job_queue = JobQueue()
+
+
+def _collect_metrics():
+    return stats_families(
+        "jobs", "Job queue", job_queue.stats, counters=("submitted", "recovered", "done", "failed"), gauges=("running",)
+    ) + [Family("jobs_queued", "gauge", "Job queue: queued", [("", {}, job_queue.snapshot()["queued"])])]
+
+
+COLLECTORS.append(_collect_metrics)
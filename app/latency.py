@@ -0,0 +1,77 @@
+import threading
+from collections import deque
+
+LATENCY_WINDOW = 500
+# Upper bounds (seconds) of the cumulative histogram buckets.
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+class LatencyWindow:
+    """The most recent ``size`` latencies (seconds) and outcome counts.
+
+    Successful latencies also go into a lifetime histogram with
+    ``LATENCY_BUCKETS`` bounds, so slow outliers stay visible after they
+    leave the window.
+    """
+
+    def __init__(self, size=LATENCY_WINDOW):
+        self.samples = deque(maxlen=size)
+        self.counts = {"calls": 0, "errors": 0}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.counts["calls"] += 1
+            if not ok:
+                self.counts["errors"] += 1
+                return
+            self.samples.append(seconds)
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            self.buckets[index] += 1
+            self.seconds += seconds
+
+    def histogram(self):
+        """Cumulative counts per upper bound, Prometheus style."""
+        with self._lock:
+            buckets = list(self.buckets)
+        histogram, total = {}, 0
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], buckets):
+            total += count
+            histogram[f"le_{bound}"] = total
+        return histogram
+
+    def lifetime(self):
+        """Per-bucket (not cumulative) success counts and their total seconds."""
+        with self._lock:
+            return list(self.buckets), self.seconds
+
+    def percentile(self, q):
+        """``q``-th percentile (0-100) of recent successes, or None if empty."""
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self.samples)
+            counts = dict(self.counts)
+        if not ordered:
+            return counts
+
+        def at(q):
+            return round(ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))] * 1000)
+
+        return dict(
+            counts,
+            samples=len(ordered),
+            mean_ms=round(sum(ordered) / len(ordered) * 1000),
+            p50_ms=at(50),
+            p95_ms=at(95),
+            p99_ms=at(99),
+            histogram=self.histogram(),
+        )
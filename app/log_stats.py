@@ -0,0 +1,98 @@
+SLEEP_TARGET_HOURS = 8.0
+
+
+def _trailing_run(np, flags, starts, ends):
+    """Length of the run of True values at the end of each group."""
+    positions = np.arange(len(flags))
+    # Index of the last False in each group, or start - 1 if there is none.
+    breaks = np.where(flags, np.repeat(starts - 1, ends - starts), positions)
+    last_break = np.maximum.reduceat(breaks, starts) if len(flags) else starts - 1
+    return ends - last_break - 1
+
+
+def batch_log_stats(logs_by_student: dict, sleep_target: float = SLEEP_TARGET_HOURS):
+    """Compute log statistics for many students in one vectorised pass.
+
+    ``logs_by_student`` maps a student id to that student's log dicts in
+    any order; each list is sorted by date before the trend and streak
+    figures are computed. Students with no logs are skipped.
+    """
+    import numpy as np  # deferred: keeps app start-up fast
+
+    ids = [key for key, logs in logs_by_student.items() if logs]
+    if not ids:
+        return {}
+
+    ordered = [sorted(logs_by_student[key], key=lambda log: str(log.get("date") or "")) for key in ids]
+    counts = np.array([len(logs) for logs in ordered])
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    group = np.repeat(np.arange(len(ids)), counts)
+
+    flat = [log for logs in ordered for log in logs]
+    sleep = np.array([float(log["sleep_hours"]) for log in flat])
+    junk = np.array([bool(log["junk_food"]) for log in flat])
+    energy = np.array([float(log["energy"]) for log in flat])
+
+    n = counts.astype(float)
+
+    def per_student(values):
+        return np.bincount(group, weights=values, minlength=len(ids))
+
+    sleep_mean = per_student(sleep) / n
+    sleep_var = np.clip(per_student(sleep ** 2) / n - sleep_mean ** 2, 0.0, None)
+    sleep_debt = per_student(np.clip(sleep_target - sleep, 0.0, None))
+    junk_rate = per_student(junk.astype(float)) / n
+    energy_mean = per_student(energy) / n
+
+    # Least-squares slope of energy against days since the student's first
+    # log, so gaps between logged days count; rows without a date are left out.
+    days = np.array([str(log.get("date") or "NaT")[:10] for log in flat], dtype="datetime64[D]")
+    dated = ~np.isnat(days)
+    day_number = np.where(dated, days.astype("int64"), np.iinfo(np.int64).max)
+    x = np.where(dated, day_number - np.repeat(np.minimum.reduceat(day_number, starts), counts), 0).astype(float)
+    dated_energy = np.where(dated, energy, 0.0)
+    nd = per_student(dated.astype(float))
+    sx, sy = per_student(x), per_student(dated_energy)
+    sxx, sxy = per_student(x * x), per_student(x * dated_energy)
+    denom = nd * sxx - sx ** 2
+    energy_slope = np.divide(nd * sxy - sx * sy, denom, out=np.zeros(len(ids)), where=denom > 0)
+
+    short_sleep_streak = _trailing_run(np, sleep < sleep_target, starts, ends)
+    junk_free_streak = _trailing_run(np, ~junk, starts, ends)
+
+    return {
+        key: {
+            "days_logged": int(counts[i]),
+            "sleep_mean_hours": round(float(sleep_mean[i]), 2),
+            "sleep_variance": round(float(sleep_var[i]), 2),
+            "sleep_target_hours": sleep_target,
+            "sleep_debt_hours": round(float(sleep_debt[i]), 1),
+            "junk_food_rate": round(float(junk_rate[i]), 2),
+            "energy_mean": round(float(energy_mean[i]), 2),
+            "energy_trend_per_day": round(float(energy_slope[i]), 2),
+            "short_sleep_streak_days": int(short_sleep_streak[i]),
+            "junk_free_streak_days": int(junk_free_streak[i]),
+        }
+        for i, key in enumerate(ids)
+    }
+
+
+def compute_log_stats(logs: list, sleep_target: float = SLEEP_TARGET_HOURS):
+    return batch_log_stats({None: logs}, sleep_target).get(None)
+
+
+def format_log_stats(stats):
+    if not stats:
+        return "No logs recorded yet."
+
+    return "\n".join([
+        f"days logged: {stats['days_logged']}",
+        f"sleep: mean {stats['sleep_mean_hours']}h, variance {stats['sleep_variance']}, "
+        f"target {stats['sleep_target_hours']:g}h",
+        f"cumulative sleep debt: {stats['sleep_debt_hours']}h",
+        f"junk food: {stats['junk_food_rate']:.0%} of days",
+        f"energy: mean {stats['energy_mean']}, trend {stats['energy_trend_per_day']:+} per day",
+        f"current streaks: {stats['short_sleep_streak_days']} day(s) under sleep target, "
+        f"{stats['junk_free_streak_days']} junk-free day(s)",
+    ])
@@ -1,10 +1,41 @@
-from fastapi import FastAPI, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+import os
+import time
 import uuid
 
+from app.ai_core import (
+    agent_pool_snapshot,
+    hedge_snapshot,
+    resilience_snapshot,
+    singleflight_snapshot,
+    tier_snapshot,
+    warm_up,
+)
+from app.cache import general_cache
 from app.db import engine, Base, SessionLocal
-from app.models import Student, HealthLog
+from app.http_client import close_http_client, http_pool_snapshot
+from app.incremental import run_incremental_analysis, summary_view
+from app.jobs import JOB_HANDLERS, JobError, job_queue, job_view
+from app.metrics import CONTENT_TYPE, MeteredRoute, render_metrics, stage
+from app.ingest import (
+    BULK_BATCH_SIZE,
+    iter_bulk_records,
+    validate_record,
+    insert_health_log_batch,
+)
+from app.migrations import run_migrations
+from app.precompute import cancel_scheduled, load_precomputed, precompute_snapshot, schedule_precompute
+from app.prompt_format import prompt_token_stats
+from app.results import analysis_input_hash, find_result, find_results, save_results
+from app.resilience import LLMError, LLMUnavailableError
+from app.models import Student, HealthLog, Job
+from app.students import latest_log_id, load_student_context
 from app.schemas import (
     StudentCreate,
     StudentResponse,
@@ -14,16 +45,12 @@ from app.schemas import (
     GeneralProfile,
 )
 
-from app.health_engine import (
-    analyze_student_health,
-    analyze_sleep_patterns,
-    analyze_nutrient_deficiency,
-    generate_personalized_student_advice,
-    generate_budget_meal_plan,
-    analyze_mess_food,
-)
+from app.health_engine import STUDENT_TASKS, run_student, stream_student, generate_student_report
 
 from app.general_engine import (
+    GENERAL_TASKS,
+    stream_general,
+    generate_full_plan,
     generate_diet,
     generate_workout,
     generate_health_summary,
@@ -34,7 +61,32 @@ from app.general_engine import (
 
 # ---------------- APP ----------------
 
-app = FastAPI(title="AI Health Backend")
+# Set DB_AUTO_MIGRATE=0 when `python -m app.migrations` runs as a deploy step.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
+LLM_WARMUP = os.getenv("LLM_WARMUP", "1") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_AUTO_MIGRATE:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.run_sync(run_migrations)
+
+    await job_queue.start()
+
+    # Load the agent stack in the background; "/" is served meanwhile.
+    warmup = asyncio.create_task(asyncio.to_thread(warm_up)) if LLM_WARMUP else None
+    yield
+    if warmup is not None:
+        await warmup
+    cancel_scheduled()
+    await job_queue.stop()
+    await close_http_client()
+    await engine.dispose()
+
+app = FastAPI(title="AI Health Backend", lifespan=lifespan)
+# Every route below is counted and timed for /metrics.
+app.router.route_class = MeteredRoute
 
 # ---------------- CORS ----------------
 
@@ -46,27 +98,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ---------------- DATABASE ----------------
+# ---------------- LLM ERRORS ----------------
 
-Base.metadata.create_all(bind=engine)
+@app.exception_handler(LLMError)
+async def llm_error_handler(request: Request, exc: LLMError):
+    if isinstance(exc, LLMUnavailableError):
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after else None
+        return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
 
-def get_db():
-    db = SessionLocal()
-    try:
+# ---------------- DATABASE ----------------
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+# ---------------- STREAMING ----------------
+
+def sse_response(chunks):
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        except Exception as exc:
+            yield f"event: error\ndata: {json.dumps({'detail': str(exc)})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ---------------- ROOT ----------------
 
 @app.get("/")
-def root():
+async def root():
     return {"status": "Backend running"}
 
+# ---------------- STATS ----------------
+
+@app.get("/stats")
+async def stats():
+    return {
+        "cache": general_cache.stats(),
+        "singleflight": singleflight_snapshot(),
+        "agent_pools": agent_pool_snapshot(),
+        "http_pool": http_pool_snapshot(),
+        "llm": resilience_snapshot(),
+        "tiers": tier_snapshot(),
+        "hedging": hedge_snapshot(),
+        "jobs": job_queue.snapshot(),
+        "precompute": precompute_snapshot(),
+        "prompt_tokens": prompt_token_stats,
+    }
+
+# ---------------- METRICS ----------------
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 # ---------------- STUDENT CREATE ----------------
 
 @app.post("/student/create", response_model=StudentResponse)
-def create_student(data: StudentCreate, db: Session = Depends(get_db)):
+async def create_student(data: StudentCreate, db: AsyncSession = Depends(get_db)):
     student_id = str(uuid.uuid4())
 
     student = Student(
@@ -79,14 +176,14 @@ def create_student(data: StudentCreate, db: Session = Depends(get_db)):
     )
 
     db.add(student)
-    db.commit()
+    await db.commit()
 
     return {"student_id": student_id}
 
 # ---------------- STUDENT LOG ----------------
 
 @app.post("/student/log")
-def add_health_log(data: HealthLogCreate, db: Session = Depends(get_db)):
+async def add_health_log(data: HealthLogCreate, db: AsyncSession = Depends(get_db)):
     log = HealthLog(
         student_id=data.student_id,
         date=data.date,
@@ -96,68 +193,259 @@ def add_health_log(data: HealthLogCreate, db: Session = Depends(get_db)):
     )
 
     db.add(log)
-    db.commit()
+    await db.commit()
+    schedule_precompute(data.student_id)
 
     return {"message": "Health log saved"}
 
+@app.post("/student/logs/bulk")
+async def bulk_add_health_logs(request: Request, precompute: bool = False, db: AsyncSession = Depends(get_db)):
+    started = time.perf_counter()
+    known_students = set()
+    touched = set()
+    results = []
+    batch = []
+
+    try:
+        async for index, record in iter_bulk_records(request):
+            row, error = validate_record(record)
+            if error:
+                results.append({"index": index, "status": "rejected", "error": error})
+                continue
+
+            batch.append((index, row))
+            if len(batch) >= BULK_BATCH_SIZE:
+                results += await insert_health_log_batch(db, batch, known_students)
+                touched.update(row["student_id"] for _, row in batch)
+                batch = []
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    if batch:
+        results += await insert_health_log_batch(db, batch, known_students)
+        touched.update(row["student_id"] for _, row in batch)
+
+    # Opt-in (?precompute=1): a semester backfill would otherwise queue an
+    # LLM analysis for every student in it.
+    if precompute:
+        for student_id in touched & known_students:
+            schedule_precompute(student_id)
+
+    results.sort(key=lambda result: result["index"])
+    accepted = sum(1 for result in results if result["status"] == "accepted")
+    elapsed = time.perf_counter() - started
+
+    return {
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(accepted / elapsed, 1) if elapsed else None,
+        "results": results,
+    }
+
 # ---------------- STUDENT ANALYZE ----------------
 
-@app.post("/student/analyze", response_model=AnalyzeResponse)
-def analyze_student(data: AnalyzeRequest, db: Session = Depends(get_db)):
-    student = db.query(Student).filter(Student.id == data.student_id).first()
-    if not student:
+async def run_student_analysis(task: str, data: AnalyzeRequest, db: AsyncSession):
+    if data.incremental:
+        analysis = await run_incremental_analysis(task, data.student_id)
+        return {"analysis": analysis if analysis is not None else "Student not found"}
+
+    with stage("db_fetch"):
+        context = await load_student_context(db, data.student_id)
+    if context is None:
         return {"analysis": "Student not found"}
 
-    logs = (
-        db.query(HealthLog)
-        .filter(HealthLog.student_id == data.student_id)
-        .order_by(HealthLog.date.desc())
-        .limit(5)
-        .all()
-    )
+    # Same inputs and prompt as a stored result (on-demand or precomputed).
+    profile, log_data, stats = context
+    input_hash = analysis_input_hash(profile, log_data, stats)
+    with stage("db_fetch"):
+        stored = await find_result(db, data.student_id, task, input_hash)
+        if stored is not None:
+            return {"analysis": stored}
+        last_log_id = await latest_log_id(db, data.student_id)
+    # No connection is held while the LLM runs.
+    await db.close()
+
+    analysis = await run_student(task, profile, log_data, stats)
+    with stage("db_write"):
+        async with SessionLocal() as session:
+            await save_results(session, data.student_id, input_hash, {task: analysis}, last_log_id)
+    return {"analysis": analysis}
 
-    profile = {
-        "age": student.age,
-        "height": student.height,
-        "weight": student.weight,
-        "budget": student.budget,
-        "bmi": student.bmi,
+@app.post("/student/analyze", response_model=AnalyzeResponse)
+async def analyze_student(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("analyze", data, db)
+
+@app.post("/student/analyze/stream")
+async def analyze_student_stream(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    with stage("db_fetch"):
+        context = await load_student_context(db, data.student_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    profile, log_data, stats = context
+    input_hash = analysis_input_hash(profile, log_data, stats)
+    with stage("db_fetch"):
+        stored = await find_result(db, data.student_id, "analyze", input_hash)
+        last_log_id = await latest_log_id(db, data.student_id)
+
+    async def chunks():
+        if stored is not None:
+            yield stored
+            return
+        parts = []
+        async for chunk in stream_student("analyze", profile, log_data, stats=stats):
+            parts.append(chunk)
+            yield chunk
+        # The request's session is closed once streaming starts.
+        with stage("db_write"):
+            async with SessionLocal() as session:
+                await save_results(session, data.student_id, input_hash, {"analyze": "".join(parts)}, last_log_id)
+
+    return sse_response(chunks())
+
+# ---------------- PRECOMPUTED ANALYSIS ----------------
+
+@app.get("/student/{student_id}/analysis")
+async def student_precomputed_analysis(student_id: str, db: AsyncSession = Depends(get_db)):
+    if not await db.get(Student, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    with stage("db_fetch"):
+        precomputed = await load_precomputed(db, student_id)
+    if not precomputed["fresh"] and not precomputed["pending"]:
+        # Nothing up to date and nothing on the way (e.g. after a restart).
+        precomputed["pending"] = schedule_precompute(student_id, delay=0)
+
+    return {"student_id": student_id, **precomputed}
+
+@app.get("/student/{student_id}/summary")
+async def student_rolling_summary(student_id: str, db: AsyncSession = Depends(get_db)):
+    if not await db.get(Student, student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+    return {"student_id": student_id, **await summary_view(db, student_id)}
+
+# ---------------- STUDENT ANALYSES ----------------
+
+@app.post("/student/nutrient-risk", response_model=AnalyzeResponse)
+async def student_nutrient_risk(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("nutrient-risk", data, db)
+
+@app.post("/student/sleep-analysis", response_model=AnalyzeResponse)
+async def student_sleep_analysis(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("sleep-analysis", data, db)
+
+@app.post("/student/advice", response_model=AnalyzeResponse)
+async def student_advice(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("advice", data, db)
+
+@app.post("/student/budget-meal", response_model=AnalyzeResponse)
+async def student_budget_meal(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("budget-meal", data, db)
+
+@app.post("/student/mess-food", response_model=AnalyzeResponse)
+async def student_mess_food(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    return await run_student_analysis("mess-food", data, db)
+
+@app.post("/student/report")
+async def student_report(data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    with stage("db_fetch"):
+        context = await load_student_context(db, data.student_id)
+    if context is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    profile, log_data, stats = context
+    input_hash = analysis_input_hash(profile, log_data, stats)
+    with stage("db_fetch"):
+        stored = await find_results(db, data.student_id, STUDENT_TASKS, input_hash)
+        last_log_id = await latest_log_id(db, data.student_id)
+    await db.close()
+
+    started = time.perf_counter()
+    sections = await generate_student_report(profile, log_data, stored, stats)
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    generated = {
+        section["section"]: section["content"]
+        for section in sections
+        if "content" in section and not section.get("stored")
     }
+    with stage("db_write"):
+        async with SessionLocal() as session:
+            await save_results(session, data.student_id, input_hash, generated, last_log_id)
 
-    log_data = [
-        {
-            "date": log.date,
-            "sleep_hours": log.sleep_hours,
-            "junk_food": log.junk_food,
-            "energy": log.energy,
-        }
-        for log in logs
-    ]
-
-    return {"analysis": analyze_student_health(profile, log_data)}
+    return {"sections": sections, "total_ms": total_ms}
 
 # ---------------- GENERAL MODE ----------------
 
 @app.post("/general/diet")
-def general_diet(data: GeneralProfile):
-    return {"diet_plan": generate_diet(data.dict())}
+async def general_diet(data: GeneralProfile):
+    return {"diet_plan": await generate_diet(data.dict())}
 
 @app.post("/general/workout")
-def general_workout(data: GeneralProfile):
-    return {"workout_plan": generate_workout(data.dict())}
+async def general_workout(data: GeneralProfile):
+    return {"workout_plan": await generate_workout(data.dict())}
 
 @app.post("/general/summary")
-def general_summary(data: GeneralProfile):
-    return {"summary": generate_health_summary(data.dict())}
+async def general_summary(data: GeneralProfile):
+    return {"summary": await generate_health_summary(data.dict())}
 
 @app.post("/general/mental")
-def general_mental(data: GeneralProfile):
-    return {"mental_support": mental_wellness_support(data.dict())}
+async def general_mental(data: GeneralProfile):
+    return {"mental_support": await mental_wellness_support(data.dict())}
 
 @app.post("/general/protein")
-def general_protein(data: GeneralProfile):
-    return {"protein_plan": protein_planning(data.dict())}
+async def general_protein(data: GeneralProfile):
+    return {"protein_plan": await protein_planning(data.dict())}
 
 @app.post("/general/what-if")
-def general_what_if(data: GeneralProfile):
-    return {"simulation": what_if_simulation(data.dict())}
+async def general_what_if(data: GeneralProfile):
+    return {"simulation": await what_if_simulation(data.dict())}
+
+@app.post("/general/{task}/stream")
+async def general_stream(task: str, data: GeneralProfile):
+    if task not in GENERAL_TASKS:
+        raise HTTPException(status_code=404, detail="Unknown general task")
+    return sse_response(stream_general(task, data.dict()))
+
+@app.post("/general/full-plan")
+async def general_full_plan(data: GeneralProfile):
+    async def lines():
+        started = time.perf_counter()
+        timings = {}
+        async for section in generate_full_plan(data.dict()):
+            timings[section["section"]] = section["elapsed_ms"]
+            yield json.dumps(section) + "\n"
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        yield json.dumps({"done": True, "total_ms": total_ms, "timings_ms": timings}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# ---------------- JOBS ----------------
+
+async def submit_job(db: AsyncSession, kind: str, params: dict, student_id=None):
+    if kind not in JOB_HANDLERS:
+        raise HTTPException(status_code=404, detail="Unknown job type")
+    try:
+        job = await job_queue.submit(db, kind, params, student_id=student_id)
+    except JobError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return job_view(job)
+
+@app.post("/jobs/student/{task}", status_code=202)
+async def submit_student_job(task: str, data: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
+    if not await db.get(Student, data.student_id):
+        raise HTTPException(status_code=404, detail="Student not found")
+    return await submit_job(db, f"student/{task}", {"student_id": data.student_id}, student_id=data.student_id)
+
+@app.post("/jobs/general/{task}", status_code=202)
+async def submit_general_job(task: str, data: GeneralProfile, db: AsyncSession = Depends(get_db)):
+    return await submit_job(db, f"general/{task}", {"profile": data.dict()})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(job)
@@ -0,0 +1,280 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+
+from app.latency import LATENCY_BUCKETS
+from app.prompts import PROMPTS
+
+# Prometheus text exposition for GET /metrics, without a client library.
+#
+# Request stages (db_fetch, prompt_build, queue_wait, llm_call, ...) are
+# timed into STAGE_SECONDS, labelled with the route they ran under and
+# the agent role for LLM work. Modules that already keep counters
+# (guards, tiers, jobs, caches) register a collector instead, which turns
+# those counters into metric families when /metrics is scraped.
+
+PREFIX = "health_"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds (seconds) of the stage histograms: sub-millisecond prompt
+# rendering up to minute-long completions.
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = []
+COLLECTORS = []
+
+
+# ===== EXPOSITION =====
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+
+class Family:
+    """One metric: name, type, help and (suffix, labels, value) samples."""
+
+    def __init__(self, name, kind, help, samples=()):
+        self.name = PREFIX + name
+        self.kind = kind
+        self.help = help
+        self.samples = list(samples)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples:
+            text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f"{self.name}{suffix}{{{text}}} {_number(value)}" if text else f"{self.name}{suffix} {_number(value)}")
+        return "\n".join(lines)
+
+
+def histogram_samples(labels, bounds, counts, total):
+    """Samples for a histogram from per-bucket (not cumulative) counts, +Inf last."""
+    samples, running = [], 0
+    for bound, count in zip(list(bounds) + [float("inf")], counts):
+        running += count
+        samples.append(("_bucket", dict(labels, le=_number(bound)), running))
+    samples.append(("_sum", labels, total))
+    samples.append(("_count", labels, running))
+    return samples
+
+
+def window_samples(labels, window):
+    """Histogram samples from a LatencyWindow's lifetime buckets."""
+    counts, total = window.lifetime()
+    return histogram_samples(labels, LATENCY_BUCKETS, counts, total)
+
+
+def stats_families(name, help, stats, counters=(), gauges=(), labels=None):
+    """Counter and gauge families from a flat stats dict such as ``job_queue.stats``."""
+    labels = labels or {}
+    families = [Family(f"{name}_{key}_total", "counter", f"{help}: {key.replace('_', ' ')}", [("", labels, stats[key])])
+                for key in counters]
+    families += [Family(f"{name}_{key}", "gauge", f"{help}: {key.replace('_', ' ')}", [("", labels, stats[key])])
+                 for key in gauges]
+    return families
+
+
+def render_metrics():
+    families = [metric.collect() for metric in METRICS]
+    for collector in COLLECTORS:
+        families.extend(collector())
+
+    # Collectors called per model or per pool may repeat a family name.
+    merged = {}
+    for family in families:
+        if family.name in merged:
+            merged[family.name].samples.extend(family.samples)
+        else:
+            merged[family.name] = family
+    return "\n".join(family.render() for family in merged.values()) + "\n"
+
+
+# ===== PRIMITIVES =====
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return Family(self.name, self.kind, self.help, [
+            ("", dict(zip(self.labels, key)), value) for key, value in values
+        ])
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels, amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels, buckets=STAGE_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, labels, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def collect(self):
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        samples = []
+        for key, series in values:
+            samples += histogram_samples(dict(zip(self.labels, key)), self.buckets, series[:-1], series[-1])
+        return Family(self.name, self.kind, self.help, samples)
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("endpoint", "method", "status"))
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "Request time until the response body ends", ("endpoint",))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", ("endpoint",))
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time per request stage", ("endpoint", "stage", "role"))
+STAGE_ERRORS = Counter("stage_errors_total", "Stages that raised", ("endpoint", "stage", "role"))
+LLM_IN_FLIGHT = Gauge("llm_calls_in_flight", "LLM calls holding an agent", ("role", "tier"))
+
+
+# ===== STAGES =====
+
+class _Context:
+    __slots__ = ("endpoint", "handler_done")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.handler_done = None
+
+
+_context = ContextVar("metrics_context", default=None)
+
+
+def endpoint_label():
+    context = _context.get()
+    return "background" if context is None else context.endpoint
+
+
+def label_context(endpoint: str):
+    """Attribute stages timed from now on in this task (and tasks it starts) to ``endpoint``."""
+    _context.set(_Context(endpoint))
+
+
+def role_label(task):
+    return PROMPTS[task].role if task else ""
+
+
+def record_stage(name: str, seconds: float, task=None):
+    STAGE_SECONDS.observe((endpoint_label(), name, role_label(task)), seconds)
+
+
+class stage:
+    """``with stage("db_fetch"):`` records the block's time under the current endpoint.
+
+    Blocks that raise also count in STAGE_ERRORS; cancelled ones (a
+    client going away, a losing hedge) are not recorded at all.
+    """
+
+    __slots__ = ("name", "task", "started")
+
+    def __init__(self, name: str, task=None):
+        self.name = name
+        self.task = task
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, kind, exc, traceback):
+        if kind is None or issubclass(kind, Exception):
+            labels = (endpoint_label(), self.name, role_label(self.task))
+            STAGE_SECONDS.observe(labels, time.perf_counter() - self.started)
+            if kind is not None:
+                STAGE_ERRORS.inc(labels)
+        return False
+
+
+# ===== ROUTES =====
+
+def _mark_handler_done(endpoint):
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        context = _context.get()
+        if context is not None:
+            context.handler_done = time.perf_counter()
+        return result
+    return timed
+
+
+class MeteredRoute(APIRoute):
+    """APIRoute that counts and times requests under the route's path template.
+
+    Time between the endpoint returning and the response starting
+    (response model validation and JSON encoding) is the
+    "serialization" stage.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _mark_handler_done(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    async def handle(self, scope, receive, send):
+        context = _Context(self.path)
+        token = _context.set(context)
+        labels = (self.path,)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if context.handler_done is not None:
+                    STAGE_SECONDS.observe((self.path, "serialization", ""), time.perf_counter() - context.handler_done)
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(labels)
+        try:
+            await super().handle(scope, receive, send_timed)
+        finally:
+            HTTP_IN_FLIGHT.dec(labels)
+            HTTP_SECONDS.observe(labels, time.perf_counter() - started)
+            HTTP_REQUESTS.inc((self.path, scope["method"], str(status)))
+            _context.reset(token)
@@ -0,0 +1,81 @@
+import logging
+
+from sqlalchemy import text
+
+from app.schemas import parse_log_date
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA user_version once the date rewrite has run. Rows written since
+# are ISO already (HealthLogCreate parses dates), so later start-ups skip
+# the full-table scan.
+ISO_DATES_VERSION = 1
+
+
+def migrate_health_log_dates(connection):
+    """Rewrite legacy free-form health_logs.date strings as ISO dates.
+
+    Older rows hold whatever the client sent, e.g. the CLI's
+    "2024-01-15 Monday". SQLite keeps the declared VARCHAR column, but the
+    stored values become the ISO strings SQLAlchemy's Date type reads back.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    if connection.execute(text("PRAGMA user_version")).scalar() >= ISO_DATES_VERSION:
+        return
+
+    rows = connection.execute(text(
+        "SELECT id, date FROM health_logs "
+        "WHERE date IS NOT NULL "
+        "AND date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+    )).all()
+
+    updates = []
+    for row_id, raw in rows:
+        try:
+            value = parse_log_date(raw).isoformat()
+        except ValueError:
+            logger.warning("health_logs.id=%s has unparseable date %r; clearing it", row_id, raw)
+            value = None
+        updates.append({"id": row_id, "date": value})
+
+    if updates:
+        connection.execute(text("UPDATE health_logs SET date = :date WHERE id = :id"), updates)
+        logger.info("Converted %d health_logs.date values to ISO dates", len(updates))
+    connection.execute(text(f"PRAGMA user_version = {ISO_DATES_VERSION}"))
+
+
+def create_health_log_indexes(connection):
+    # create_all() only indexes tables it creates; existing DBs need this.
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_health_logs_student_id_date "
+        "ON health_logs (student_id, date)"
+    ))
+
+
+MIGRATIONS = [
+    migrate_health_log_dates,
+    create_health_log_indexes,
+]
+
+
+def run_migrations(connection):
+    for migration in MIGRATIONS:
+        migration(connection)
+
+
+async def _migrate():
+    from app.db import engine, Base
+    import app.models  # noqa: F401  (registers tables on Base)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(run_migrations)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_migrate())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, ForeignKey, Index, Text
 from app.db import Base
 
 class Student(Base):
@@ -13,10 +13,60 @@ class Student(Base):
 
 class HealthLog(Base):
     __tablename__ = "health_logs"
+    __table_args__ = (
+        # "latest N logs for a student" is an index range scan
+        Index("ix_health_logs_student_id_date", "student_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(String, ForeignKey("students.id"))
-    date = Column(String)
+    date = Column(Date)
     sleep_hours = Column(Float)
     junk_food = Column(Boolean)
     energy = Column(Integer)
+
+class StudentSummary(Base):
+    """Rolling summary of a student's logs up to ``last_log_id``."""
+    __tablename__ = "student_summaries"
+
+    student_id = Column(String, ForeignKey("students.id"), primary_key=True)
+    summary = Column(Text)
+    last_log_id = Column(Integer)
+    logs_summarized = Column(Integer, default=0)
+    updated_at = Column(DateTime)
+
+class AnalysisResult(Base):
+    __tablename__ = "analysis_results"
+    __table_args__ = (
+        Index(
+            "ux_analysis_results_key",
+            "student_id", "analysis_type", "input_hash", "prompt_version",
+            unique=True,
+        ),
+        # latest result per (student, type) is one index seek
+        Index("ix_analysis_results_latest", "student_id", "analysis_type", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(String, ForeignKey("students.id"), nullable=False)
+    analysis_type = Column(String, nullable=False)
+    input_hash = Column(String, nullable=False)   # sha256 of profile + logs
+    prompt_version = Column(String, nullable=False)
+    content = Column(Text)
+    last_log_id = Column(Integer)                 # newest log when generated
+    created_at = Column(DateTime)
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    student_id = Column(String, ForeignKey("students.id"), index=True, nullable=True)
+    params = Column(Text)                     # JSON
+    status = Column(String, index=True)       # pending / running / done / failed
+    result = Column(Text)                     # JSON
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.health_engine import STUDENT_TASKS, run_student
+from app.jobs import JOB_HANDLERS, JobError, job_queue
+from app.metrics import COLLECTORS, stats_families
+from app.models import Job
+from app.prompts import PROMPTS
+from app.results import analysis_input_hash, find_results, latest_results, save_results
+from app.students import latest_log_id, load_student_context
+
+logger = logging.getLogger(__name__)
+
+# A log write schedules a recomputation of the student's PRECOMPUTE_TASKS
+# PRECOMPUTE_DEBOUNCE seconds later; further logs in that window push it
+# back, so a burst of logs costs one run. PRECOMPUTE=0 turns it off.
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE", "1") == "1"
+PRECOMPUTE_DEBOUNCE = float(os.getenv("PRECOMPUTE_DEBOUNCE", "30"))
+PRECOMPUTE_TASKS = tuple(
+    task.strip() for task in os.getenv("PRECOMPUTE_TASKS", "analyze").split(",") if task.strip() in STUDENT_TASKS
+)
+PRECOMPUTE_KIND = "student/precompute"
+
+precompute_stats = {"scheduled": 0, "debounced": 0, "submitted": 0}
+
+_timers = {}
+_submissions = set()
+
+
+# ===== JOB =====
+
+async def _precompute(params):
+    student_id = params["student_id"]
+    async with SessionLocal() as db:
+        last_log_id = await latest_log_id(db, student_id)
+        context = await load_student_context(db, student_id)
+        if context is None:
+            raise JobError("Student not found")
+        profile, logs, stats = context
+        input_hash = analysis_input_hash(profile, logs, stats)
+        stored = await find_results(db, student_id, PRECOMPUTE_TASKS, input_hash)
+
+    missing = [task for task in PRECOMPUTE_TASKS if task not in stored]
+    texts = await asyncio.gather(*(run_student(task, profile, logs, stats) for task in missing))
+
+    async with SessionLocal() as db:
+        await save_results(db, student_id, input_hash, dict(zip(missing, texts)), last_log_id)
+    return {"last_log_id": last_log_id, "generated": missing, "reused": sorted(stored)}
+
+
+JOB_HANDLERS[PRECOMPUTE_KIND] = _precompute
+
+
+# ===== SCHEDULING =====
+
+def schedule_precompute(student_id: str, delay: float = None):
+    """Queue a recomputation after ``delay`` seconds; False when precompute is off."""
+    if not PRECOMPUTE_ENABLED or not PRECOMPUTE_TASKS:
+        return False
+
+    timer = _timers.pop(student_id, None)
+    if timer is not None:
+        timer.cancel()
+        precompute_stats["debounced"] += 1
+    precompute_stats["scheduled"] += 1
+
+    loop = asyncio.get_running_loop()
+    _timers[student_id] = loop.call_later(
+        PRECOMPUTE_DEBOUNCE if delay is None else delay, _fire, student_id
+    )
+    return True
+
+
+def _fire(student_id):
+    _timers.pop(student_id, None)
+    submission = asyncio.ensure_future(_submit(student_id))
+    _submissions.add(submission)
+    submission.add_done_callback(_submissions.discard)
+
+
+async def _submit(student_id):
+    try:
+        async with SessionLocal() as db:
+            await job_queue.submit(db, PRECOMPUTE_KIND, {"student_id": student_id}, student_id=student_id)
+        precompute_stats["submitted"] += 1
+    except Exception:
+        logger.exception("could not queue precompute for student %s", student_id)
+
+
+def cancel_scheduled():
+    """Drop debounce timers on shutdown; stale results are recomputed on read."""
+    for timer in _timers.values():
+        timer.cancel()
+    _timers.clear()
+
+
+def precompute_snapshot():
+    return dict(precompute_stats, waiting=len(_timers), tasks=list(PRECOMPUTE_TASKS), debounce_seconds=PRECOMPUTE_DEBOUNCE)
+
+
+COLLECTORS.append(lambda: stats_families(
+    "precompute", "Precompute", precompute_snapshot(), counters=("scheduled", "debounced", "submitted"), gauges=("waiting",)
+))
+
+
+# ===== READING =====
+
+async def load_precomputed(db, student_id: str):
+    """Latest stored analyses and whether they match the student's current inputs."""
+    context = await load_student_context(db, student_id)
+    latest = await latest_results(db, student_id, PRECOMPUTE_TASKS)
+    queued = await db.scalar(
+        select(Job.id)
+        .where(Job.student_id == student_id, Job.kind == PRECOMPUTE_KIND, Job.status.in_(("pending", "running")))
+        .limit(1)
+    )
+
+    fresh = False
+    if context is not None and len(latest) == len(PRECOMPUTE_TASKS):
+        current = analysis_input_hash(*context)
+        fresh = all(
+            row.input_hash == current and row.prompt_version == PROMPTS[task].version
+            for task, row in latest.items()
+        )
+
+    return {
+        "analyses": {task: row.content for task, row in latest.items()} or None,
+        "computed_at": max((row.created_at for row in latest.values()), default=None),
+        "fresh": fresh,
+        "pending": student_id in _timers or queued is not None,
+    }
@@ -0,0 +1,141 @@
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+
+from app.metrics import COLLECTORS, Family
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional; fall back to the heuristic below
+    _encoding = None
+
+# Input token budget per task; PROMPT_TOKEN_BUDGET changes the default and
+# PROMPT_TOKEN_BUDGET__ADVICE (task name upper-cased) overrides one task.
+DEFAULT_TOKEN_BUDGET = 1500
+TOKEN_BUDGETS = {
+    "advice": 2000,
+}
+
+LOG_COLUMNS = ("date", "sleep_hours", "junk_food", "energy")
+
+_WORD = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+prompt_token_stats = {}
+
+
+def estimate_tokens(text: str):
+    """Count tokens with tiktoken when installed, else approximate BPE.
+
+    The fallback counts one token per punctuation mark and one per ~4
+    characters of each word, which tracks cl100k within a few percent on
+    these English/markdown prompts.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return sum(math.ceil(len(word) / 4) for word in _WORD.findall(text))
+
+
+@lru_cache(maxsize=None)
+def static_tokens(text: str):
+    """Token count of a fixed system prefix, computed once per text."""
+    return estimate_tokens(text)
+
+
+def token_budget(task: str):
+    key = re.sub(r"[^0-9A-Za-z]+", "_", task).upper()
+    value = os.getenv(f"PROMPT_TOKEN_BUDGET__{key}") or os.getenv("PROMPT_TOKEN_BUDGET")
+    if value:
+        return int(value)
+    return TOKEN_BUDGETS.get(task, DEFAULT_TOKEN_BUDGET)
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return "Y" if value else "N"
+    if isinstance(value, float):
+        return f"{value:g}"
+    if value is None:
+        return "-"
+    return str(value)
+
+
+def format_profile(profile: dict):
+    return "\n".join(f"{key}: {_value(value)}" for key, value in profile.items())
+
+
+def format_logs(logs: list, omitted: int = 0):
+    """Render logs oldest-first as a pipe-separated table."""
+    note = f"({omitted} older day(s) omitted; covered by LOG STATISTICS)"
+    if not logs:
+        return note if omitted else "No logs recorded yet."
+
+    lines = ["|".join(LOG_COLUMNS)]
+    if omitted:
+        lines.append(note)
+    for log in sorted(logs, key=lambda log: str(log.get("date") or "")):
+        lines.append("|".join(_value(log.get(column)) for column in LOG_COLUMNS))
+    return "\n".join(lines)
+
+
+def record_prompt_tokens(task: str, tokens: int):
+    stats = prompt_token_stats.setdefault(task, {"prompts": 0, "total": 0, "max": 0})
+    stats["prompts"] += 1
+    stats["total"] += tokens
+    stats["max"] = max(stats["max"], tokens)
+
+
+def fit_logs_to_budget(task: str, render, logs: list, system: str = ""):
+    """Render ``render(logs_text)`` within the task's token budget.
+
+    The budget covers the static ``system`` prefix plus the rendered
+    input. Oldest log rows are dropped until the prompt fits or only the
+    newest is left, so a long summary or profile cannot crowd out every
+    log. Returns the rendered input.
+    """
+    budget = token_budget(task)
+    fixed = static_tokens(system)
+    rows = sorted(logs, key=lambda log: str(log.get("date") or ""))
+    omitted = 0
+
+    prompt = render(format_logs(rows))
+    tokens = fixed + estimate_tokens(prompt)
+    while tokens > budget and len(rows) > 1:
+        drop = max(1, len(rows) // 4)
+        rows = rows[drop:]
+        omitted += drop
+        prompt = render(format_logs(rows, omitted))
+        tokens = fixed + estimate_tokens(prompt)
+
+    record_prompt_tokens(task, tokens)
+    logger.info(
+        "prompt %s: %d input tokens (budget %d, %d log rows, %d omitted)",
+        task, tokens, budget, len(rows), omitted,
+    )
+    return prompt
+
+
+def count_prompt(task: str, prompt: str, system: str = ""):
+    tokens = static_tokens(system) + estimate_tokens(prompt)
+    record_prompt_tokens(task, tokens)
+    logger.info("prompt %s: %d input tokens", task, tokens)
+    return prompt
+
+
+def _collect_metrics():
+    stats = list(prompt_token_stats.items())
+    return [
+        Family("prompts_total", "counter", "Prompts rendered per task", [
+            ("", {"task": task}, values["prompts"]) for task, values in stats
+        ]),
+        Family("prompt_tokens_total", "counter", "Estimated prompt tokens per task", [
+            ("", {"task": task}, values["total"]) for task, values in stats
+        ]),
+    ]
+
+
+COLLECTORS.append(_collect_metrics)
@@ -1,226 +1,481 @@
-# ================= STUDENT MODE =================
+import hashlib
+
+# ============================================================
+# PROMPT REGISTRY
+# ------------------------------------------------------------
+# Each task's static instructions become its agent's system message and
+# never change between calls, so provider-side prefix caching can reuse
+# them. Only the short ``user`` suffix is rendered per request.
+# ============================================================
+
+ROLES = {
+    "student_health": "college student health risk analyst",
+    "sleep_analyzer": "student sleep pattern analyst",
+    "nutrient_risk": "student nutrient deficiency risk assessor",
+    "student_advisor": "college lifestyle and academic advisor",
+    "mess_food": "hostel mess food optimization expert",
+    "budget_meal": "budget hostel meal planner",
+    "diet": "fitness diet planner",
+    "workout": "fitness workout planner",
+    "mental": "mental wellness coach",
+    "history_summarizer": "student health history summarizer",
+}
+
+
+class PromptTemplate:
+    def __init__(self, name: str, role: str, system: str, user: str):
+        self.name = name
+        self.role = role
+        self.description = ROLES[role]
+        self.system = system.strip("\n")
+        self.user = user.strip("\n")
+
+        digest = hashlib.sha256()
+        for part in (self.description, self.system, self.user):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        # Changes whenever the wording changes; part of every cache key.
+        self.version = digest.hexdigest()[:12]
+
+    def render(self, **fields):
+        return self.user.format(**fields)
+
+
+PROMPTS = {}
+
+
+def register(name: str, role: str, system: str, user: str):
+    PROMPTS[name] = PromptTemplate(name, role, system, user)
+
+
+GENERAL_INPUT = """
+USER PROFILE:
+{profile}
+"""
 
-STUDENT_HEALTH_ANALYSIS_PROMPT = """
-⚠️ COMPREHENSIVE STUDENT HEALTH RISK ANALYSIS
-============================================================
 
+def student_input(logs_label: str):
+    return f"""
 STUDENT PROFILE:
-{profile}
-
-RECENT HEALTH LOGS:
-{logs}
+{{profile}}
 
-Generate a LONG, DETAILED report with:
+{logs_label}:
+{{logs}}
 
-### 1. Overall Health Risk Overview
-### 2. Lifestyle Risk Factors
-- Sleep
-- Junk food
-- Energy levels
-- Budget constraints
+LOG STATISTICS (precomputed; quote these, do not recalculate):
+{{stats}}
+"""
 
-### 3. Academic Performance Impact
-### 4. Short-Term Risks (3–6 months)
-### 5. Long-Term Risks (1–3 years)
-### 6. Practical Hostel-Friendly Improvements
-### 7. Warning Signs & When to Seek Help
 
-Use clear headings, bullet points, and Indian college context.
-No medical diagnosis.
-"""
+# ================= GENERAL MODE =================
 
-SLEEP_ANALYSIS_PROMPT = """
-😴 SLEEP PATTERN ANALYSIS
+register(
+    "diet",
+    role="diet",
+    system="""
+🥗 CUSTOMIZED DIET PLAN
 ============================================================
 
-PROFILE:
-{profile}
+You are a Professional Fitness Nutritionist.
 
-SLEEP DATA:
-{logs}
+Generate a LONG, DETAILED, PRACTICAL diet plan including:
 
-Include:
-### Average Sleep Duration
-### Sleep Consistency
-### Sleep Debt
-### Impact on Energy & Focus
-### Hostel-Specific Issues
-### 7-Day Improvement Plan
-### Red Flags
-"""
+### 1. Nutrition Goal Explanation
+- Explain goal relevance (fat loss / muscle gain / endurance)
 
-NUTRIENT_DEFICIENCY_PROMPT = """
-🔬 NUTRIENT DEFICIENCY RISK ASSESSMENT
-============================================================
+### 2. Daily Meal Structure
+- Breakfast
+- Lunch
+- Dinner
+- Snacks
 
-PROFILE:
-{profile}
+### 3. Food Choices (Indian Context)
+- Veg and non-veg options
+- Portion guidance
+- Affordable substitutions
 
-LOGS:
-{logs}
+### 4. Weekly Meal Plan (Sample)
+- Day-wise suggestions
 
-For EACH nutrient (Protein, Iron, B12, Vitamin D, Calcium, Fiber):
-- Risk level
-- Why risk exists
-- Symptoms to watch
-- Budget-friendly Indian food sources
-"""
+### 5. Hydration & Micronutrients
+- Water intake
+- Fruits & vegetables
 
-PERSONALIZED_ADVICE_PROMPT = """
-💡 PERSONALIZED STUDENT ADVICE
+### 6. Common Mistakes to Avoid
+### 7. Sustainability Tips
+
+Use markdown headings, bullet points, and friendly tone.
+Avoid medical claims.
+""",
+    user=GENERAL_INPUT,
+)
+
+register(
+    "workout",
+    role="workout",
+    system="""
+🏋️ CUSTOMIZED WORKOUT PLAN
 ============================================================
 
-**Comprehensive College Student Advice**
+You are a Certified Fitness Trainer.
 
-PROFILE:
-{profile}
+Generate a LONG, DETAILED workout plan including:
 
-LOGS:
-{logs}
+### 1. Fitness Goal Alignment
+### 2. Weekly Workout Split
+- Strength days
+- Cardio days
+- Rest days
 
-Generate a VERY LONG, STRUCTURED response with:
+### 3. Exercise Selection
+- Beginner-friendly
+- No-equipment / gym alternatives
 
-### 1. Academic Success (Year-Specific)
-- Semester-wise study table
-- Exam strategies
-- Time management
+### 4. Sets, Reps & Intensity
+### 5. Recovery & Mobility
+### 6. Safety & Injury Prevention
 
-### 2. Budget Healthy Eating (₹200–400/week)
-- Weekly shopping list with prices
-- Hostel meal prep
+Use clear structure and motivational tone.
+""",
+    user=GENERAL_INPUT,
+)
 
-### 3. Hostel Room Fitness
-- 15-min routines
-- Study break exercises
-- Using hostel furniture
+register(
+    "summary",
+    role="diet",
+    system="""
+📊 COMPLETE HEALTH SUMMARY
+============================================================
 
-### 4. Stress Management
-- Academic stress
-- Relaxation techniques
-- Social balance
+Provide a LONG, HOLISTIC health overview including:
 
-### 5. Health Monitoring
-- Warning signs
-- Campus resources
-- When to seek help
+### 1. BMI & Body Composition Interpretation
+### 2. Strengths & Positive Habits
+### 3. Current Health Risks
+### 4. Diet Improvement Focus Areas
+### 5. Workout Improvement Focus Areas
+### 6. 30-Day Action Plan
 
-Use markdown tables, bullet points, and detailed explanations.
-"""
+Use encouraging, coach-style language.
+""",
+    user=GENERAL_INPUT,
+)
 
-BUDGET_MEAL_PROMPT = """
-🥗 BUDGET MEAL PLAN FOR HOSTEL STUDENT
+register(
+    "mental",
+    role="mental",
+    system="""
+🧠 MENTAL WELLNESS SUPPORT
 ============================================================
 
-PROFILE:
-{profile}
+You are a Mental Wellness Coach.
 
-LOGS:
-{logs}
+Provide a DETAILED response including:
 
-Provide:
-- Weekly budget breakdown
-- Shopping list with prices
-- Breakfast/Lunch/Dinner
-- Mess integration
-- Snacks
-- Money-saving tips
-"""
+### 1. Common Stress Sources
+### 2. Mental Health Risks
+### 3. Daily Stress-Reduction Techniques
+### 4. Mindfulness & Focus Practices
+### 5. Motivation & Consistency Tips
+### 6. When to Seek Professional Help
 
-HOSTEL_WORKOUT_PROMPT = """
-🏋️ HOSTEL ROOM WORKOUT PLAN
+Keep the tone supportive and non-clinical.
+""",
+    user=GENERAL_INPUT,
+)
+
+register(
+    "protein",
+    role="diet",
+    system="""
+🥩 PROTEIN PLANNING GUIDE
 ============================================================
 
-PROFILE:
-{profile}
+Generate a LONG, DETAILED protein guide including:
+
+### 1. Daily Protein Requirement
+### 2. Veg Protein Sources
+### 3. Non-Veg Protein Sources
+### 4. Budget-Friendly Options
+### 5. Protein Timing
+### 6. Common Myths & Mistakes
+
+Use Indian food examples.
+""",
+    user=GENERAL_INPUT,
+)
+
+register(
+    "what-if",
+    role="workout",
+    system="""
+🔮 WHAT-IF HEALTH SIMULATION
+============================================================
 
-LOGS:
-{logs}
+Simulate outcomes if the user:
 
-Include:
-- 15-min daily routine
-- Quiet room exercises
-- Study break movements
-- Weekly frequency
-- Safety tips
-"""
+### 1. Improves Diet Consistency
+### 2. Exercises 4–5 Days/Week
+### 3. Sleeps 7–8 Hours Daily
+
+For each scenario:
+- Physical changes
+- Mental changes
+- Energy & productivity
 
-MESS_FOOD_PROMPT = """
-🍽️ MESS FOOD OPTIMIZATION
+Predict outcomes after:
+- 2 weeks
+- 1 month
+- 3 months
+
+Use realistic expectations and motivating tone.
+""",
+    user=GENERAL_INPUT,
+)
+
+# ================= STUDENT MODE =================
+
+register(
+    "analyze",
+    role="student_health",
+    system="""
+⚠️ COMPREHENSIVE STUDENT HEALTH RISK ANALYSIS
 ============================================================
 
-PROFILE:
-{profile}
+You are an expert College Student Health Risk Analyst.
 
-EATING PATTERNS:
-{logs}
+Generate a LONG, DETAILED report including:
 
-Include:
-- Best mess food choices
-- Nutrient pairing
-- Junk food alternatives
-- Budget supplements
-- Weekend eating strategy
-"""
+### 1. Overall Health Risk Overview
+- Physical health risks
+- Mental health risks
+- Lifestyle imbalance indicators
 
-# ================= GENERAL MODE =================
+### 2. Lifestyle Risk Factors
+- Sleep patterns
+- Junk food frequency
+- Energy levels
+- Budget constraints
 
-GENERAL_DIET_PROMPT = """
-🥗 COMPREHENSIVE DIET PLAN
-============================================================
-PROFILE:
-{profile}
+### 3. Academic Performance Impact
+- Focus
+- Memory
+- Exam performance
+- Burnout risk
 
-Provide:
-- Goals
-- Daily structure
-- Weekly plan
-- Sustainability tips
-"""
+### 4. Short-Term Risks (Next 3–6 months)
+### 5. Long-Term Risks (If habits continue)
+
+### 6. Practical, Hostel-Friendly Improvements
+- Daily habits
+- Study-life balance
+- Affordable fixes
 
-GENERAL_WORKOUT_PROMPT = """
-🏋️ COMPLETE WORKOUT PLAN
+### 7. Warning Signs & When to Seek Help
+
+Use Indian college context.
+Use bullet points and headings.
+Avoid medical diagnosis.
+""",
+    user=student_input("RECENT HEALTH LOGS"),
+)
+
+register(
+    "sleep-analysis",
+    role="sleep_analyzer",
+    system="""
+😴 SLEEP PATTERN ANALYSIS FOR COLLEGE STUDENT
 ============================================================
-PROFILE:
-{profile}
 
-Provide:
-- Weekly split
-- Progression
-- Recovery
-"""
+Analyze in detail:
+
+### 1. Average Sleep Duration
+### 2. Sleep Consistency vs Irregularity
+### 3. Sleep Debt Accumulation
+### 4. Impact on Energy, Mood & Focus
+### 5. Hostel-Specific Sleep Challenges
+### 6. 7-Day Sleep Improvement Plan
+### 7. Red Flags & When to Seek Help
+
+Use practical, student-friendly language.
+Avoid medical diagnosis.
+""",
+    user=student_input("SLEEP DATA"),
+)
+
+register(
+    "nutrient-risk",
+    role="nutrient_risk",
+    system="""
+🔬 NUTRIENT DEFICIENCY RISK ASSESSMENT
+============================================================
+
+Analyze the risk of deficiencies for:
 
-GENERAL_SUMMARY_PROMPT = """
-📊 HEALTH SUMMARY
+### Protein
+### Iron
+### Vitamin B12
+### Vitamin D
+### Calcium
+### Fiber
+
+For EACH nutrient:
+- Risk Level (Low / Moderate / High)
+- Why this risk exists
+- Common symptoms to watch
+- Budget-friendly Indian food sources
+- Hostel-friendly options
+
+Do NOT diagnose.
+Focus on risk awareness and food-based improvements.
+""",
+    user=student_input("RECENT HEALTH LOGS"),
+)
+
+register(
+    "advice",
+    role="student_advisor",
+    system="""
+💡 PERSONALIZED STUDENT ADVICE
 ============================================================
-PROFILE:
-{profile}
+**Comprehensive College Student Advice**
 
-Include BMI, strengths, risks, and improvement plan.
-"""
+You are a Senior College Lifestyle & Wellness Mentor.
 
-GENERAL_MENTAL_PROMPT = """
-🧠 MENTAL WELLNESS SUPPORT
+Generate a VERY LONG, STRUCTURED response with:
+
+### 1. Academic Success (3 Year Specific)
+- Semester-wise study schedule (table)
+- Exam preparation strategies
+- Time management techniques
+
+### 2. Budget Healthy Eating (₹200–400/week)
+- Weekly shopping list with prices
+- Hostel meal preparation tips
+- Snack planning
+
+### 3. Hostel Room Fitness
+- 15-minute daily routines
+- Study break exercises
+- Using hostel furniture safely
+
+### 4. Stress Management
+- Academic stress sources
+- Relaxation techniques
+- Social life balance
+
+### 5. Health Monitoring
+- Warning signs to watch
+- Campus health resources
+- When to seek professional help
+
+### Additional Tips
+- Journaling
+- Habit tracking
+- Motivation & consistency
+
+Use markdown tables, bullet points, and headings.
+Use encouraging, student-friendly tone.
+Avoid medical diagnosis.
+""",
+    user=student_input("RECENT LOGS"),
+)
+
+register(
+    "budget-meal",
+    role="budget_meal",
+    system="""
+🥗 BUDGET MEAL PLAN FOR HOSTEL STUDENT
 ============================================================
-PROFILE:
-{profile}
 
-Include stress sources, coping strategies, and habits.
-"""
+Create a LONG, PRACTICAL plan including:
+
+### Weekly Budget Breakdown (₹200–400)
+### Weekly Shopping List with Prices
+### Breakfast Options
+### Lunch Options
+### Dinner Options
+### Mess Food Optimization
+### Study Snacks
+### Money-Saving Tips
+
+Assume limited cooking facilities.
+Use realistic Indian prices.
+""",
+    user=student_input("RECENT LOGS"),
+)
+
+register(
+    "mess-food",
+    role="mess_food",
+    system="""
+🍽️ MESS FOOD OPTIMIZATION GUIDE
+============================================================
+
+Provide detailed guidance on:
+
+### Best Mess Food Choices
+### Nutrient Pairing Strategies
+### Junk Food Alternatives
+### Budget Supplements
+### Weekend & Eating-Out Strategy
 
-GENERAL_PROTEIN_PROMPT = """
-🥩 PROTEIN PLANNING
+Focus on Indian hostel mess context.
+Be extremely practical and realistic.
+""",
+    user=student_input("EATING PATTERNS"),
+)
+
+register(
+    "hostel-workout",
+    role="student_health",
+    system="""
+🏋️ HOSTEL ROOM WORKOUT PLAN
 ============================================================
-PROFILE:
-{profile}
 
-Include requirements, sources, budget options.
-"""
+Generate a detailed plan including:
+
+### 15-Minute Daily Workout Routine
+### Quiet Room-Friendly Exercises
+### Study Break Movements
+### Weekly Frequency Plan
+### Safety Guidelines
+
+No equipment.
+Small room.
+Student-safe intensity.
+""",
+    user=student_input("RECENT LOGS"),
+)
+
+# ================= ROLLING SUMMARY =================
 
-GENERAL_WHAT_IF_PROMPT = """
-🔮 WHAT-IF SIMULATION
+register(
+    "rolling-summary",
+    role="history_summarizer",
+    system="""
+📝 ROLLING HEALTH HISTORY SUMMARY
 ============================================================
-PROFILE:
-{profile}
 
-Simulate 3-month outcomes for better diet, sleep, activity.
-"""
+Merge the previous summary and the new health logs into ONE updated
+summary of the student's whole history.
+
+Keep:
+- Date range covered
+- Typical sleep, junk food and energy levels
+- Trends and how they changed over time
+- Notable streaks, dips and recoveries
+
+Rules:
+- At most 150 words, plain text, no headings
+- Older periods may be compressed, never dropped entirely
+- Facts only; no advice
+""",
+    user="""
+PREVIOUS SUMMARY:
+{summary}
+
+NEW HEALTH LOGS:
+{logs}
+""",
+)
@@ -0,0 +1,222 @@
+import asyncio
+import random
+import re
+import time
+
+# agno turns provider exceptions into an error run whose content is the
+# provider's message, so retryability is read from that text.
+RETRYABLE_MESSAGE = re.compile(
+    r"rate.?limit|\b429\b|timed? ?out|timeout|connection error|over capacity|overloaded"
+    r"|service.?unavailable|internal.?server|\b50[0234]\b",
+    re.IGNORECASE,
+)
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMUnavailableError(LLMError):
+    """The provider is failing fast (circuit open) or retries ran out."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message, retryable=True, retry_after=retry_after)
+
+
+def as_llm_error(exc):
+    if isinstance(exc, LLMError):
+        return exc
+    status = getattr(exc, "status_code", None)
+    retryable = (
+        status in RETRYABLE_STATUS
+        or isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+        or bool(RETRYABLE_MESSAGE.search(str(exc)))
+    )
+    return LLMError(str(exc) or type(exc).__name__, retryable=retryable)
+
+
+def error_from_message(message):
+    return LLMError(message, retryable=bool(RETRYABLE_MESSAGE.search(message or "")))
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Allows ``per_minute`` units per minute, with bursts up to that size."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount=1.0):
+        """Take ``amount`` now if available, without waiting."""
+        if self.capacity <= 0:
+            return True
+        amount = min(float(amount), self.capacity)
+        self._refill()
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+    async def acquire(self, amount=1.0):
+        if self.capacity <= 0:
+            return
+        amount = min(float(amount), self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive retryable failures.
+
+    While open, calls fail immediately; after ``reset_timeout`` seconds one
+    trial call is let through (half-open) and its outcome closes or
+    re-opens the circuit. A trial that ends with neither outcome (the
+    caller was cancelled) must be handed back with ``release_trial()``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def before_call(self):
+        """Raise while open; returns True when this call is the half-open trial."""
+        if self.state == "closed":
+            return False
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        raise LLMUnavailableError("LLM provider circuit is open", retry_after=max(1, round(remaining)))
+
+    def release_trial(self):
+        self.trial_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class ModelGuard:
+    """Rate limits, retries and circuit breaking for one model."""
+
+    def __init__(self, rpm, tpm, max_retries, retry_base_delay, retry_max_delay,
+                 breaker_failures, breaker_reset):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.breaker = CircuitBreaker(breaker_failures, breaker_reset)
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "rejected_open": 0}
+
+    async def admit(self, tokens):
+        """Wait for rate-limit capacity; fail fast while the circuit is open.
+
+        Returns True when the call is the breaker's half-open trial; pass
+        that to ``release()`` if the call is abandoned before it settles.
+        """
+        try:
+            trial = self.breaker.before_call()
+        except LLMUnavailableError:
+            self.stats["rejected_open"] += 1
+            raise
+        try:
+            await self.requests.acquire(1)
+            await self.tokens.acquire(tokens)
+        except BaseException:
+            self.release(trial)
+            raise
+        return trial
+
+    def release(self, trial):
+        """Hand back an abandoned half-open trial so the next call can run it."""
+        if trial:
+            self.breaker.release_trial()
+
+    def try_admit(self, tokens):
+        """Admit an optional extra call only if it needs no waiting."""
+        return self.breaker.state == "closed" and self.requests.try_acquire(1) and self.tokens.try_acquire(tokens)
+
+    def on_success(self):
+        self.breaker.record_success()
+
+    def on_failure(self, exc, attempt, max_retries=None):
+        """Return the backoff delay before the next attempt, or raise."""
+        error = as_llm_error(exc)
+        if not error.retryable:
+            self.breaker.record_success()  # the provider answered
+            raise error from exc
+
+        self.breaker.record_failure()
+        if attempt >= (self.max_retries if max_retries is None else max_retries):
+            self.stats["failures"] += 1
+            retry_after = self.breaker.reset_timeout if self.breaker.state == "open" else self.retry_max_delay
+            raise LLMUnavailableError(
+                f"LLM call failed after {attempt + 1} attempts: {error}",
+                retry_after=max(1, round(retry_after)),
+            ) from exc
+
+        self.stats["retries"] += 1
+        return backoff_delay(attempt, self.retry_base_delay, self.retry_max_delay)
+
+    async def call(self, attempt_fn, tokens, max_retries=None):
+        """Run ``attempt_fn()`` with rate limiting, retries and the breaker."""
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            trial = await self.admit(tokens)
+            try:
+                result = await attempt_fn()
+            except Exception as exc:
+                await asyncio.sleep(self.on_failure(exc, attempt, max_retries))
+                attempt += 1
+                continue
+            except BaseException:
+                self.release(trial)
+                raise
+
+            self.on_success()
+            return result
+
+    def snapshot(self):
+        return dict(
+            self.stats,
+            breaker_state=self.breaker.state,
+            consecutive_failures=self.breaker.failures,
+            request_tokens_available=round(self.requests.tokens, 1),
+            token_budget_available=round(self.tokens.tokens),
+        )
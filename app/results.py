@@ -0,0 +1,72 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import AnalysisResult
+from app.prompts import PROMPTS
+
+# Generated student analyses are kept in analysis_results, keyed by the
+# student, the analysis type, a hash of the exact profile, logs and log
+# statistics sent and the prompt version. The same inputs under the same
+# prompt never pay for a second generation.
+
+
+def analysis_input_hash(profile: dict, logs: list, stats=None):
+    payload = json.dumps(
+        {"profile": profile, "logs": logs, "stats": stats}, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def find_results(db, student_id: str, tasks, input_hash: str):
+    """Stored content per task for these exact inputs and current prompts."""
+    rows = await db.execute(
+        select(AnalysisResult.analysis_type, AnalysisResult.prompt_version, AnalysisResult.content)
+        .where(
+            AnalysisResult.student_id == student_id,
+            AnalysisResult.input_hash == input_hash,
+            AnalysisResult.analysis_type.in_(list(tasks)),
+        )
+    )
+    return {row.analysis_type: row.content for row in rows if row.prompt_version == PROMPTS[row.analysis_type].version}
+
+
+async def find_result(db, student_id: str, task: str, input_hash: str):
+    return (await find_results(db, student_id, [task], input_hash)).get(task)
+
+
+async def save_results(db, student_id: str, input_hash: str, contents: dict, last_log_id=None):
+    """Insert one row per task; rows another request stored first are kept."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for task, content in contents.items():
+        db.add(AnalysisResult(
+            student_id=student_id,
+            analysis_type=task,
+            input_hash=input_hash,
+            prompt_version=PROMPTS[task].version,
+            content=content,
+            last_log_id=last_log_id,
+            created_at=now,
+        ))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+
+
+async def latest_results(db, student_id: str, tasks):
+    """Most recent stored result per task, whatever its inputs."""
+    latest = {}
+    for task in tasks:
+        row = await db.scalar(
+            select(AnalysisResult)
+            .where(AnalysisResult.student_id == student_id, AnalysisResult.analysis_type == task)
+            .order_by(AnalysisResult.created_at.desc(), AnalysisResult.id.desc())
+            .limit(1)
+        )
+        if row is not None:
+            latest[task] = row
+    return latest
@@ -1,5 +1,26 @@
-from pydantic import BaseModel
+from datetime import date, datetime
+from pydantic import BaseModel, field_validator
 from typing import List
+import re
+
+_ISO_DATE_PREFIX = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:[ T].*)?$")
+
+
+def parse_log_date(value):
+    """Parse ISO dates, the CLI's "YYYY-MM-DD Weekday" and DD/MM/YYYY."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    text = str(value).strip()
+    match = _ISO_DATE_PREFIX.match(text)
+    if match:
+        return date.fromisoformat(match.group(1))
+    try:
+        return datetime.strptime(text, "%d/%m/%Y").date()
+    except ValueError:
+        raise ValueError(f"unrecognised date {text!r}, expected YYYY-MM-DD")
 
 # ---------- STUDENT ----------
 
@@ -19,16 +40,24 @@ class StudentResponse(BaseModel):
 
 class HealthLogCreate(BaseModel):
     student_id: str
-    date: str
+    date: date
     sleep_hours: float
     junk_food: bool
     energy: int
 
+    @field_validator("date", mode="before")
+    @classmethod
+    def _parse_date(cls, value):
+        return parse_log_date(value)
+
 
 # ---------- ANALYSIS ----------
 
 class AnalyzeRequest(BaseModel):
     student_id: str
+    # Send the rolling history summary plus logs added since the last
+    # incremental run instead of the latest five logs.
+    incremental: bool = False
 
 
 class AnalyzeResponse(BaseModel):
@@ -0,0 +1,86 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.log_stats import compute_log_stats
+from app.models import Student, HealthLog
+
+# Logs shown to the model as a raw table; the statistics cover every log.
+CONTEXT_LOGS = 5
+
+
+def student_profile(student: Student):
+    return {
+        "age": student.age,
+        "height": student.height,
+        "weight": student.weight,
+        "budget": student.budget,
+        "bmi": student.bmi,
+    }
+
+
+def log_row(log: HealthLog):
+    return {
+        "date": log.date.isoformat() if log.date else None,
+        "sleep_hours": log.sleep_hours,
+        "junk_food": log.junk_food,
+        "energy": log.energy,
+    }
+
+
+async def load_student_context(db: AsyncSession, student_id: str):
+    """(profile, newest CONTEXT_LOGS logs, statistics over the whole history), or None."""
+    student = await db.get(Student, student_id)
+    if not student:
+        return None
+
+    logs = (
+        await db.scalars(
+            select(HealthLog)
+            .where(HealthLog.student_id == student_id)
+            .order_by(HealthLog.date.desc())
+            .limit(CONTEXT_LOGS)
+        )
+    ).all()
+    stats = compute_log_stats(await load_log_history(db, student_id))
+
+    return student_profile(student), [log_row(log) for log in logs], stats
+
+
+async def latest_log_id(db: AsyncSession, student_id: str):
+    """Id of the student's most recently written log, or None."""
+    return await db.scalar(select(func.max(HealthLog.id)).where(HealthLog.student_id == student_id))
+
+
+async def load_logs_after(db: AsyncSession, student_id: str, after_id: int, limit: int, newest: bool = False):
+    """Logs written after log ``after_id``, in write order, with their ids.
+
+    The first ``limit`` of them, or with ``newest`` the last ``limit``.
+    """
+    logs = (
+        await db.scalars(
+            select(HealthLog)
+            .where(HealthLog.student_id == student_id, HealthLog.id > after_id)
+            .order_by(HealthLog.id.desc() if newest else HealthLog.id)
+            .limit(limit)
+        )
+    ).all()
+    if newest:
+        logs = logs[::-1]
+    return [dict(log_row(log), id=log.id) for log in logs]
+
+
+async def load_log_history(db: AsyncSession, student_id: str):
+    """Every log of the student; only the columns the statistics need."""
+    rows = await db.execute(
+        select(HealthLog.date, HealthLog.sleep_hours, HealthLog.junk_food, HealthLog.energy)
+        .where(HealthLog.student_id == student_id)
+    )
+    return [
+        {
+            "date": row.date.isoformat() if row.date else None,
+            "sleep_hours": row.sleep_hours,
+            "junk_food": row.junk_food,
+            "energy": row.energy,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,71 @@
+"""Stress the per-task agent pools with hundreds of parallel runs.
+
+Uses a stub agent instead of Groq, so it needs no network or API key:
+
+    python -m benchmarks.agent_pool_stress --runs 500 --pool-size 8
+
+The stub keeps per-run state on the agent, like agno agents do. If two
+runs ever shared an agent at once, a reply would carry another run's
+prompt and the check fails.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+# The check is about pool checkout, not provider limits: without this the
+# runs queue on the default token bucket for minutes.
+os.environ.update({"LLM_RPM": "0", "LLM_TPM": "0"})
+
+import app.ai_core as ai_core  # noqa: E402
+
+
+class StubAgent:
+    def __init__(self):
+        self.current_prompt = None
+        self.busy = False
+
+    async def arun(self, prompt, stream=False):
+        if self.busy:
+            raise AssertionError("agent checked out by two runs at once")
+        self.busy = True
+        self.current_prompt = prompt
+        try:
+            await asyncio.sleep(random.uniform(0.001, 0.02))
+            return type("RunOutput", (), {"content": f"reply to {self.current_prompt}"})()
+        finally:
+            self.busy = False
+
+
+async def stress(runs, pool_size):
+    for pool in ai_core.AGENT_POOLS.values():
+        pool.factory = StubAgent
+        pool.size = pool_size
+
+    tasks = list(ai_core.PROMPTS)
+    jobs = [(random.choice(tasks), f"prompt-{i}") for i in range(runs)]
+    replies = await asyncio.gather(*(ai_core.safe_run(task, prompt) for task, prompt in jobs))
+
+    crossed = [(prompt, reply) for (_, prompt), reply in zip(jobs, replies) if reply != f"reply to {prompt}"]
+    created = {f"{task}/{tier}": pool.created for (task, tier), pool in ai_core.AGENT_POOLS.items() if pool.created}
+    return crossed, created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    crossed, created = asyncio.run(stress(args.runs, args.pool_size))
+    print(f"{args.runs} runs, agents created per task: {created}")
+
+    if crossed or any(count > args.pool_size for count in created.values()):
+        print(f"FAILED: {len(crossed)} crossed replies, e.g. {crossed[:3]}")
+        sys.exit(1)
+    print("OK: no replies crossed between runs, pools stayed within bounds")
+
+
+if __name__ == "__main__":
+    main()
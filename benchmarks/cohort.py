@@ -0,0 +1,154 @@
+"""Populate a SQLite database with a synthetic student cohort.
+
+    python -m benchmarks.cohort                                  # 100k students, ~200 logs each, into health.db
+    python -m benchmarks.cohort --students 5000 --mean-days 60 --database /tmp/small.db
+    python -m benchmarks.cohort --reset                          # start from an empty file
+
+Students get plausible ages, heights, BMIs and budgets. Each logs for a
+lognormally distributed number of days with per-student adherence (gaps
+between entries), a personal sleep baseline with weekend lie-ins, a
+junk-food habit and energy that tracks both. Rows are appended to the
+app's own schema, so the API, migrations and benchmarks run against it
+unchanged. The same --seed always produces the same cohort.
+"""
+import argparse
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+
+BUDGETS = ("<200", "200-400", "400-600", ">600")
+BUDGET_WEIGHTS = (0.2, 0.45, 0.25, 0.1)
+FIRST_DAY = np.datetime64("2023-01-01")
+MAX_DAYS = 730
+
+
+def create_schema(path):
+    from app.models import Base, HealthLog  # registers every table on Base
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return HealthLog.__table__
+
+
+def create_indexes(path, table):
+    engine = create_engine(f"sqlite:///{path}")
+    for index in table.indexes:
+        index.create(engine, checkfirst=True)
+    engine.dispose()
+
+
+def students_chunk(rng, count):
+    ids = [str(uuid.UUID(int=int(rng.integers(0, 2 ** 63)) << 64 | int(rng.integers(0, 2 ** 63)), version=4))
+           for _ in range(count)]
+    age = rng.choice(np.arange(17, 26), size=count, p=np.array([4, 10, 14, 14, 13, 11, 8, 5, 3]) / 82)
+    height = np.clip(rng.normal(168, 9, count), 145, 200)
+    bmi = np.clip(rng.normal(22, 3.5, count), 15, 40)
+    weight = bmi * (height / 100) ** 2
+    budget = rng.choice(len(BUDGETS), size=count, p=BUDGET_WEIGHTS)
+    rows = [
+        (ids[i], int(age[i]), round(float(height[i]), 1), round(float(weight[i]), 1), BUDGETS[budget[i]], round(float(bmi[i]), 1))
+        for i in range(count)
+    ]
+    return ids, rows
+
+
+def logs_chunk(rng, ids, mean_days):
+    count = len(ids)
+    days = np.clip(rng.lognormal(np.log(mean_days) - 0.18, 0.6, count), 1, MAX_DAYS).astype(int)
+    total = int(days.sum())
+    owner = np.repeat(np.arange(count), days)
+    ends = np.cumsum(days)
+    starts = ends - days
+
+    # Gaps between entries: 1 = logged the next day. Low adherence, longer gaps.
+    adherence = rng.beta(5, 1.5, count)
+    gaps = rng.geometric(adherence[owner])
+    offsets = np.cumsum(gaps)
+    offsets -= np.repeat(offsets[starts] - gaps[starts], days)
+    span = np.maximum.reduceat(offsets, starts)
+    first = (rng.random(count) * np.maximum(MAX_DAYS - span, 0)).astype(int)
+    day = first[owner] + offsets - 1
+    dates = FIRST_DAY + day
+    weekend = ((day + 6) % 7) >= 5  # 2023-01-01 was a Sunday
+
+    sleep = rng.normal(6.8, 0.7, count)[owner] + rng.normal(0, 0.9, total) + 0.8 * weekend
+    sleep = np.round(np.clip(sleep, 3, 11) * 2) / 2
+    junk = rng.random(total) < np.clip(rng.beta(2, 4, count)[owner] + 0.1 * weekend, 0, 1)
+    energy = np.clip(np.round(5 + 0.8 * (sleep - 7) - 0.8 * junk + rng.normal(0, 1.2, total)), 1, 10).astype(int)
+
+    date_text = dates.astype(str)
+    return zip(
+        (ids[i] for i in owner.tolist()),
+        date_text.tolist(),
+        sleep.tolist(),
+        junk.tolist(),
+        energy.tolist(),
+    ), total
+
+
+def generate(path, students, mean_days, seed=0, chunk=2000, reset=False, quiet=False):
+    path = Path(path)
+    if reset and path.exists():
+        path.unlink()
+    table = create_schema(path)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.execute("PRAGMA journal_mode=MEMORY")
+    connection.execute("PRAGMA cache_size=-262144")
+    # Index maintenance on random student ids dominates a bulk load; rebuild after.
+    for index in table.indexes:
+        connection.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    written_students = written_logs = 0
+    for offset in range(0, students, chunk):
+        ids, student_rows = students_chunk(rng, min(chunk, students - offset))
+        log_rows, count = logs_chunk(rng, ids, mean_days)
+        connection.executemany(
+            "INSERT INTO students (id, age, height, weight, budget, bmi) VALUES (?, ?, ?, ?, ?, ?)", student_rows
+        )
+        connection.executemany(
+            "INSERT INTO health_logs (student_id, date, sleep_hours, junk_food, energy) VALUES (?, ?, ?, ?, ?)", log_rows
+        )
+        connection.commit()
+        written_students += len(ids)
+        written_logs += count
+        if not quiet:
+            rate = written_logs / (time.perf_counter() - started)
+            print(f"\r{written_students:,} students, {written_logs:,} logs ({rate:,.0f} logs/s)", end="", flush=True)
+
+    if not quiet:
+        print("\nbuilding indexes...")
+    connection.close()
+    create_indexes(path, table)
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("ANALYZE")
+    connection.close()
+    if not quiet:
+        print(f"done in {time.perf_counter() - started:.1f}s: {path}")
+    return written_students, written_logs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="health.db", help="SQLite file (appended to unless --reset)")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--mean-days", type=float, default=200, help="mean logs per student")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=2000, help="students per transaction")
+    parser.add_argument("--reset", action="store_true", help="delete the database file first")
+    args = parser.parse_args()
+    generate(args.database, args.students, args.mean_days, args.seed, args.chunk, args.reset)
+
+
+if __name__ == "__main__":
+    main()
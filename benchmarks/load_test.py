@@ -0,0 +1,301 @@
+"""End-to-end load test of the API at a fixed request rate.
+
+Starts uvicorn on a scratch database with the offline fake LLM backend
+(no network or API key needed), seeds students and logs, then sends an
+open-loop mix of requests across every endpoint at --rps:
+
+    python -m benchmarks.load_test --rps 20 --duration 30
+    python -m benchmarks.load_test --error-rate 0.05 --stall-rate 0.01
+    python -m benchmarks.load_test --url http://127.0.0.1:8000   # existing server
+    python -m benchmarks.load_test --rpm 1000 --tpm 250000       # with provider rate limits
+
+The started server runs without the provider RPM/TPM buckets unless
+--rpm/--tpm are given, so by default the run measures the app rather
+than the limiter. With them, each call reserves --output-tokens of
+completion (LLM_OUTPUT_TOKEN_ESTIMATE), the fake backend's reply length.
+
+Reports throughput, p50/p95/p99 latency and error rate per endpoint and
+overall. --json writes the same figures to a file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.startup import ROOT, _free_port
+
+GENERAL_TASKS = ("diet", "workout", "summary", "mental", "protein", "what-if")
+STUDENT_ANALYSES = ("analyze", "nutrient-risk", "sleep-analysis", "advice", "budget-meal", "mess-food")
+# Streams and multi-section responses report failures in-band with status 200.
+IN_BAND_ERROR = re.compile(r'event: error|"error":\s*"')
+GOALS = ("Fat Loss", "Muscle Gain", "Maintenance")
+DIETS = ("veg", "non-veg", "vegan")
+
+
+# ===== SERVER =====
+
+def start_server(workdir, args):
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(ROOT) + os.pathsep + env.get("PYTHONPATH", ""),
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir}/load.db",
+        "GROQ_API_KEY": env.get("GROQ_API_KEY", "load-test"),
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_TTFT_MEDIAN": str(args.latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+        "FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "FAKE_LLM_STALL_RATE": str(args.stall_rate),
+        "FAKE_LLM_SEED": str(args.seed),
+        "LLM_RPM": str(args.rpm),
+        "LLM_TPM": str(args.tpm),
+        "LLM_OUTPUT_TOKEN_ESTIMATE": str(args.output_tokens),
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("server did not answer / within the timeout")
+
+
+# ===== WORKLOAD =====
+
+def general_profile(rng, profiles):
+    # A bounded pool of profiles, so the general cache sees hits and misses.
+    index = rng.randrange(profiles)
+    local = random.Random(index)
+    return {
+        "name": f"user{index}",
+        "age": local.randint(17, 45),
+        "height": round(local.uniform(150, 190), 1),
+        "weight": round(local.uniform(45, 100), 1),
+        "goal": local.choice(GOALS),
+        "activity_level": local.randint(1, 5),
+        "diet_type": local.choice(DIETS),
+    }
+
+
+def log_entry(rng, student_id, day):
+    return {
+        "student_id": student_id,
+        "date": f"2024-{1 + day // 28:02d}-{1 + day % 28:02d}",
+        "sleep_hours": round(min(10, max(3, rng.gauss(6.8, 1.2))), 1),
+        "junk_food": rng.random() < 0.35,
+        "energy": rng.randint(2, 9),
+    }
+
+
+async def seed(client, rng, students, days):
+    ids = []
+    for _ in range(students):
+        response = await client.post("/student/create", json={
+            "age": rng.randint(17, 24),
+            "height": round(rng.uniform(150, 190), 1),
+            "weight": round(rng.uniform(45, 95), 1),
+            "budget": rng.choice(["<200", "200-400", ">400"]),
+            "bmi": round(rng.uniform(17, 30), 1),
+        })
+        ids.append(response.json()["student_id"])
+
+    body = "\n".join(json.dumps(log_entry(rng, sid, day)) for sid in ids for day in range(days))
+    response = await client.post("/student/logs/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    response.raise_for_status()
+    return ids, {sid: days for sid in ids}
+
+
+def build_mix(rng, args, students, next_day):
+    """(weight, label, request factory) for every endpoint."""
+
+    def profile():
+        return general_profile(rng, args.profiles)
+
+    def student():
+        return rng.choice(students)
+
+    def new_log():
+        sid = student()
+        next_day[sid] += 1
+        return log_entry(rng, sid, next_day[sid])
+
+    mix = [
+        (1, "GET /", lambda: ("GET", "/", None)),
+        (1, "GET /stats", lambda: ("GET", "/stats", None)),
+        (1, "GET /metrics", lambda: ("GET", "/metrics", None)),
+        (4, "POST /student/log", lambda: ("POST", "/student/log", new_log())),
+        (2, "GET /student/{id}/analysis", lambda: ("GET", f"/student/{student()}/analysis", None)),
+        (1, "GET /student/{id}/summary", lambda: ("GET", f"/student/{student()}/summary", None)),
+        (1, "POST /student/analyze/stream", lambda: ("POST", "/student/analyze/stream", {"student_id": student()})),
+        (1, "POST /student/analyze (incremental)",
+         lambda: ("POST", "/student/analyze", {"student_id": student(), "incremental": True})),
+        (1, "POST /student/report", lambda: ("POST", "/student/report", {"student_id": student()})),
+        (1, "POST /general/{task}/stream", lambda: ("POST", f"/general/{rng.choice(GENERAL_TASKS)}/stream", profile())),
+        (1, "POST /general/full-plan", lambda: ("POST", "/general/full-plan", profile())),
+        (1, "POST /jobs/general/{task}", lambda: ("POST", f"/jobs/general/{rng.choice(GENERAL_TASKS)}", profile())),
+        (1, "POST /jobs/student/{task}",
+         lambda: ("POST", f"/jobs/student/{rng.choice(STUDENT_ANALYSES)}", {"student_id": student()})),
+    ]
+    for task in GENERAL_TASKS:
+        mix.append((1, f"POST /general/{task}", lambda task=task: ("POST", f"/general/{task}", profile())))
+    for task in STUDENT_ANALYSES:
+        mix.append((1, f"POST /student/{task}", lambda task=task: ("POST", f"/student/{task}", {"student_id": student()})))
+    return mix
+
+
+# ===== RUN =====
+
+async def send(client, label, method, path, body, results):
+    started = time.perf_counter()
+    ok = False
+    try:
+        response = await client.request(method, path, json=body)
+        ok = response.status_code < 400 and not IN_BAND_ERROR.search(response.text)
+    except httpx.HTTPError:
+        pass
+    results.append((label, time.perf_counter() - started, ok))
+
+
+async def run_load(client, mix, rng, rps, duration):
+    weights = [weight for weight, _, _ in mix]
+    results = []
+    pending = set()
+    started = time.perf_counter()
+    sent = 0
+
+    # Open loop: requests go out on schedule however slow the server is.
+    while (elapsed := time.perf_counter() - started) < duration:
+        due = int(elapsed * rps) + 1
+        while sent < due:
+            _, label, factory = rng.choices(mix, weights)[0]
+            method, path, body = factory()
+            task = asyncio.create_task(send(client, label, method, path, body, results))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            sent += 1
+        await asyncio.sleep(min(0.01, 1 / rps))
+
+    sending_seconds = time.perf_counter() - started
+    if pending:
+        await asyncio.wait(pending)
+    return results, sending_seconds, time.perf_counter() - started
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def summarise(results, wall_seconds):
+    groups = {}
+    for label, seconds, ok in results:
+        groups.setdefault(label, []).append((seconds, ok))
+    groups["TOTAL"] = [(seconds, ok) for _, seconds, ok in results]
+
+    report = {}
+    for label, samples in groups.items():
+        ordered = sorted(seconds for seconds, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        report[label] = {
+            "requests": len(samples),
+            "rps": round(len(samples) / wall_seconds, 2),
+            "p50_ms": round(percentile(ordered, 50) * 1000),
+            "p95_ms": round(percentile(ordered, 95) * 1000),
+            "p99_ms": round(percentile(ordered, 99) * 1000),
+            "mean_ms": round(statistics.fmean(ordered) * 1000),
+            "error_rate": round(errors / len(samples), 4),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'endpoint':44} {'reqs':>6} {'rps':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'errors':>7}")
+    for label, row in sorted(report.items(), key=lambda item: (item[0] == "TOTAL", item[0])):
+        print(
+            f"{label:44} {row['requests']:6} {row['rps']:7.2f} {row['p50_ms']:6}ms {row['p95_ms']:6}ms "
+            f"{row['p99_ms']:6}ms {row['error_rate']:7.2%}"
+        )
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    workdir = tempfile.TemporaryDirectory()
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(workdir.name, args)
+
+    try:
+        limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+        async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client)
+            students, next_day = await seed(client, rng, args.students, args.days)
+            mix = build_mix(rng, args, students, next_day)
+            print(f"seeded {len(students)} students x {args.days} logs; {args.rps} rps for {args.duration}s against {url}")
+
+            results, sending, wall = await run_load(client, mix, rng, args.rps, args.duration)
+            server_stats = (await client.get("/stats")).json()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        workdir.cleanup()
+
+    report = summarise(results, wall)
+    print_report(report)
+    print(f"offered {len(results) / sending:.1f} rps over {sending:.1f}s; drained in {wall:.1f}s")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "config": {key: value for key, value in vars(args).items() if key != "json"},
+            "endpoints": report,
+            "server_stats": server_stats,
+        }, indent=2, default=str) + "\n")
+        print(f"written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="test a running server instead of starting one (its LLM backend is used as is)")
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of sending")
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--days", type=int, default=14, help="seeded logs per student")
+    parser.add_argument("--profiles", type=int, default=50, help="distinct general-mode profiles")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM median time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake LLM calls failing with 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of fake LLM calls that hang 30s")
+    parser.add_argument("--rpm", type=int, default=0, help="server LLM_RPM (0 = no request bucket)")
+    parser.add_argument("--tpm", type=int, default=0, help="server LLM_TPM (0 = no token bucket)")
+    parser.add_argument("--timeout", type=float, default=300, help="client timeout per request (s)")
+    parser.add_argument("--max-connections", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the report to this file")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""Microbenchmarks for the CPU and DB hot paths around each LLM call.
+
+    python -m benchmarks.microbench                 # compare against the baseline
+    python -m benchmarks.microbench --update        # record a new baseline
+    python -m benchmarks.microbench -k prompt       # only benchmarks whose name contains "prompt"
+    python -m benchmarks.microbench --database health.db   # DB queries against a generated cohort
+
+Covers prompt rendering, log statistics, input hashing, request
+validation, the CLI's log formatting, metrics overhead and the
+per-request DB queries.
+Unless --database is given, the DB benchmarks run on a small cohort
+generated by benchmarks.cohort in a temporary directory.
+
+Every benchmark is calibrated to about --min-time seconds per repeat;
+the best time per call over --repeats repeats (as timeit reports it,
+the figure least disturbed by other load) is compared with
+benchmarks/microbench_baseline.json and the script exits non-zero when
+any exceeds its baseline by more than --tolerance (default 30%).
+
+The baseline holds absolute times and is only meaningful on the host
+that recorded it, so it is not committed (.gitignore): the first run on
+a machine records it, and --update re-records it. Benchmarks missing
+from the baseline are skipped, so -k runs can add to it with --update.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from benchmarks.cohort import generate
+
+BASELINE = Path(__file__).with_name("microbench_baseline.json")
+
+
+# ===== DATA =====
+
+def make_profile(rng):
+    return {"age": rng.randint(17, 24), "height": 170.0, "weight": 62.5, "budget": "200-400", "bmi": 21.6}
+
+
+def make_logs(rng, count, first=date(2024, 1, 1)):
+    return [
+        {
+            "id": index + 1,
+            "date": (first + timedelta(days=index)).isoformat(),
+            "sleep_hours": round(rng.uniform(4, 9), 1),
+            "junk_food": rng.random() < 0.35,
+            "energy": rng.randint(2, 9),
+        }
+        for index in range(count)
+    ]
+
+
+def make_cli_logs(rng, count):
+    return [
+        {
+            "date": f"2024-01-{index + 1:02d} Monday",
+            "sleep": {"hours": 6.5, "quality": rng.randint(1, 5), "bed_time": "01:30"},
+            "meals": {
+                "breakfast": "yes", "lunch": "yes", "dinner": rng.choice(["yes", "no"]),
+                "ate_junk": rng.random() < 0.4, "junk_details": "maggi", "ate_fruits": rng.random() < 0.5,
+                "water_glasses": rng.randint(3, 10),
+            },
+            "energy": {"level": rng.randint(1, 5), "focus": rng.randint(1, 5), "symptoms": ["1", "4"]},
+        }
+        for index in range(count)
+    ]
+
+
+GENERAL_PROFILE = {
+    "name": "Asha", "age": 21, "height": 162.0, "weight": 55.0,
+    "goal": "Muscle Gain", "activity_level": 3, "diet_type": "veg",
+}
+
+
+# ===== BENCHMARKS =====
+
+def cpu_benchmarks():
+    """name -> zero-argument callable."""
+    from app.general_engine import render_general_prompt
+    from app.health_engine import render_incremental_prompt, render_student_prompt
+    from app.log_stats import batch_log_stats, compute_log_stats
+    from app.metrics import render_metrics, stage
+    from app.results import analysis_input_hash
+    from app.schemas import GeneralProfile, HealthLogCreate
+    from lifestylecode import StudentHealthTracker
+
+    rng = random.Random(0)
+    profile = make_profile(rng)
+    logs = make_logs(rng, 5)
+    new_logs = make_logs(rng, 30)
+    stats = compute_log_stats(new_logs)
+    summary = "Sleeps about 6.5h on weekdays, more at weekends; junk food three times a week. " * 6
+    cohort = {f"s{index}": make_logs(rng, 30) for index in range(1000)}
+    log_record = {"student_id": "s1", "date": "2024-03-05", "sleep_hours": 7, "junk_food": False, "energy": 6}
+    tracker = StudentHealthTracker()
+    cli_logs = make_cli_logs(rng, 7)
+
+    def timed_stage():
+        with stage("microbench", "analyze"):
+            pass
+
+    return {
+        "prompt.student_analyze": lambda: render_student_prompt("analyze", profile, logs),
+        "prompt.student_advice": lambda: render_student_prompt("advice", profile, logs),
+        "prompt.student_incremental": lambda: render_incremental_prompt("analyze", profile, summary, new_logs, stats),
+        "prompt.general_diet": lambda: render_general_prompt("diet", GENERAL_PROFILE),
+        "stats.compute_log_stats_5": lambda: compute_log_stats(logs),
+        "stats.compute_log_stats_30": lambda: compute_log_stats(new_logs),
+        "stats.batch_log_stats_1000x30": lambda: batch_log_stats(cohort),
+        "hash.analysis_input": lambda: analysis_input_hash(profile, logs, stats),
+        "validate.general_profile": lambda: GeneralProfile(**GENERAL_PROFILE),
+        "validate.health_log_iso": lambda: HealthLogCreate(**log_record),
+        "validate.health_log_cli_date": lambda: HealthLogCreate(**dict(log_record, date="2024-03-05 Tuesday")),
+        "validate.health_log_dmy": lambda: HealthLogCreate(**dict(log_record, date="05/03/2024")),
+        "cli.format_data_for_analysis_7": lambda: tracker._format_data_for_analysis(cli_logs),
+        "metrics.stage": timed_stage,
+        "metrics.render": render_metrics,
+    }
+
+
+def db_benchmarks(student_ids):
+    """name -> zero-argument coroutine function."""
+    from app.db import SessionLocal
+    from app.results import find_result
+    from app.students import latest_log_id, load_log_history, load_student_context
+
+    rng = random.Random(0)
+
+    def query(fn):
+        async def run():
+            async with SessionLocal() as db:
+                return await fn(db, rng.choice(student_ids))
+        return run
+
+    return {
+        "db.load_student_context": query(load_student_context),
+        "db.latest_log_id": query(latest_log_id),
+        "db.load_log_history": query(load_log_history),
+        "db.find_result_miss": query(lambda db, sid: find_result(db, sid, "analyze", "0" * 64)),
+    }
+
+
+# ===== TIMING =====
+
+def _calibrate(run_batch, min_time):
+    number = 1
+    while True:
+        elapsed = run_batch(number)
+        if elapsed >= min_time or number >= 1 << 20:
+            return number
+        number *= max(2, min(10, int(min_time / max(elapsed, 1e-9)) + 1))
+
+
+def time_sync(fn, repeats, min_time):
+    def run_batch(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - started
+
+    number = _calibrate(run_batch, min_time)
+    return min(run_batch(number) / number for _ in range(repeats))
+
+
+def time_async(loop, fn, repeats, min_time):
+    async def batch(number):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        return time.perf_counter() - started
+
+    def run_batch(number):
+        return loop.run_until_complete(batch(number))
+
+    number = _calibrate(run_batch, min_time)
+    return min(run_batch(number) / number for _ in range(repeats))
+
+
+def run(args, database):
+    from app.db import engine
+
+    def selected(benchmarks):
+        return {name: fn for name, fn in benchmarks.items() if not args.k or args.k in name}
+
+    results = {}
+    for name, fn in selected(cpu_benchmarks()).items():
+        results[name] = time_sync(fn, args.repeats, args.min_time)
+        print(f"{name:40} {results[name] * 1e6:12.2f} us")
+
+    with sqlite3.connect(database) as connection:
+        student_ids = [row[0] for row in connection.execute("SELECT id FROM students ORDER BY random() LIMIT 1000")]
+
+    db = selected(db_benchmarks(student_ids))
+    if db:
+        loop = asyncio.new_event_loop()
+        try:
+            for name, fn in db.items():
+                results[name] = time_async(loop, fn, args.repeats, args.min_time)
+                print(f"{name:40} {results[name] * 1e6:12.2f} us")
+            loop.run_until_complete(engine.dispose())
+        finally:
+            loop.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", help="only run benchmarks whose name contains this")
+    parser.add_argument("--database", help="SQLite file from benchmarks.cohort (default: a small generated one)")
+    parser.add_argument("--students", type=int, default=2000, help="size of the generated cohort")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    parser.add_argument("--update", action="store_true", help="write the measured times as the new baseline")
+    args = parser.parse_args()
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database
+        if database is None:
+            database = str(Path(workdir) / "cohort.db")
+        # Before anything imports app.db, which binds its engine to this URL.
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+        if args.database is None:
+            generate(database, args.students, mean_days=60, quiet=True)
+        results = run(args, database)
+
+    if args.update or not BASELINE.exists():
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        baseline.update({name: round(value * 1e6, 2) for name, value in results.items()})
+        BASELINE.write_text(json.dumps(dict(sorted(baseline.items())), indent=2) + "\n")
+        print(f"baseline written to {BASELINE.name} (microseconds per call)")
+        return
+
+    baseline = json.loads(BASELINE.read_text())
+    regressions = [
+        f"{name}: {value * 1e6:.2f}us vs baseline {baseline[name]:.2f}us"
+        for name, value in results.items()
+        if name in baseline and value * 1e6 > baseline[name] * (1 + args.tolerance)
+    ]
+    if regressions:
+        print("REGRESSION\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print(f"OK: within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
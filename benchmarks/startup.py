@@ -0,0 +1,141 @@
+"""Cold-start benchmark: `import app.main` time and time to first `/` response.
+
+    python -m benchmarks.startup                  # compare against the baseline
+    python -m benchmarks.startup --update         # record a new baseline
+    python -m benchmarks.startup --against main   # compare against a git ref, measured now
+
+Each sample runs in a fresh interpreter. The median of --runs samples is
+compared with benchmarks/startup_baseline.json and the script exits
+non-zero when either figure exceeds the baseline by more than
+--tolerance (default 25%).
+
+The baseline holds absolute seconds and is only meaningful on the host
+that recorded it, so it is not committed (.gitignore): the first run on
+a machine records it, and --update re-records it. --against sidesteps
+the file by exporting the ref with `git archive` and timing it in the
+same run, alternating samples between the two trees.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).with_name("startup_baseline.json")
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _env(workdir, root=ROOT):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(root) + os.pathsep + env.get("PYTHONPATH", "")
+    env["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/startup.db"
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    return env
+
+
+def measure_import(workdir, root=ROOT):
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_SNIPPET], cwd=workdir, env=_env(workdir, root))
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(workdir, root=ROOT, timeout=30.0):
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir,
+        env=_env(workdir, root),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer / within the timeout")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def export_ref(ref, destination):
+    """Write the tree of git ``ref`` to ``destination``."""
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, check=True, capture_output=True).stdout
+    Path(destination).mkdir()
+    subprocess.run(["tar", "-x", "-C", str(destination)], input=archive, check=True)
+    return Path(destination)
+
+
+def measure(workdir, roots, runs):
+    """root -> {figure: median}; samples alternate between roots so drift hits them alike."""
+    samples = {root: {"import_seconds": [], "first_response_seconds": []} for root in roots}
+    # A database per tree, in case their schemas differ.
+    workdirs = {root: Path(workdir) / f"tree{index}" for index, root in enumerate(roots)}
+    for path in workdirs.values():
+        path.mkdir()
+    for _ in range(runs):
+        for root in roots:
+            samples[root]["import_seconds"].append(measure_import(workdirs[root], root))
+            samples[root]["first_response_seconds"].append(measure_first_response(workdirs[root], root))
+    return {root: {name: statistics.median(values) for name, values in figures.items()} for root, figures in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update", action="store_true", help="write the measured medians as the new baseline")
+    parser.add_argument("--against", metavar="REF", help="git ref to time in the same run instead of using the baseline file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.against:
+            reference = export_ref(args.against, Path(workdir) / "reference")
+            measured = measure(workdir, (ROOT, reference), args.runs)
+            results, baseline = measured[ROOT], measured[reference]
+        else:
+            results = measure(workdir, (ROOT,), args.runs)[ROOT]
+
+    for name, value in results.items():
+        print(f"{name}: {value:.3f}")
+
+    label = args.against or "baseline"
+    if not args.against:
+        if args.update or not BASELINE.exists():
+            BASELINE.write_text(json.dumps({k: round(v, 3) for k, v in results.items()}, indent=2) + "\n")
+            print(f"baseline written to {BASELINE.name}")
+            return
+        baseline = json.loads(BASELINE.read_text())
+
+    regressions = [
+        f"{name}: {value:.3f}s vs {label} {baseline[name]:.3f}s"
+        for name, value in results.items()
+        if name in baseline and value > baseline[name] * (1 + args.tolerance)
+    ]
+    if regressions:
+        print("REGRESSION\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print(f"OK: within {args.tolerance:.0%} of {label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import os
+import importlib.util
+import httpx
 from dotenv import load_dotenv
 from agno.agent import Agent
 from agno.models.groq import Groq
@@ -9,9 +11,6 @@ from datetime import datetime, timedelta
 # ---------------- ENV ------------------
 load_dotenv()
 API_KEY = os.getenv("GROQ_API_KEY")
-if not API_KEY:
-    print("❌ GROQ_API_KEY missing in .env file")
-    exit(1)
 
 MODEL = "llama-3.1-8b-instant"
 
@@ -34,10 +33,19 @@ SAFETY & RELIABILITY RULES:
         return f"❌ Error: {e}"
 
 
+# ----------- HTTP CLIENT ---------------
+# One keep-alive pool shared by every agent instead of a client per model.
+http_client = httpx.Client(
+    http2=importlib.util.find_spec("h2") is not None,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+    timeout=120,
+)
+
+
 # ----------- AI AGENTS -----------------
 def make_agent(desc):
     return Agent(
-        model=Groq(id=MODEL),
+        model=Groq(id=MODEL, http_client=http_client),
         description=desc,
         markdown=True
     )
@@ -973,6 +981,11 @@ class HealthAI:
 
 # ---------------- MAIN APPLICATION ------------------
 def main():
+    # Checked here, not at import, so the helpers can be imported without a key.
+    if not API_KEY:
+        print("❌ GROQ_API_KEY missing in .env file")
+        exit(1)
+
     health_ai = HealthAI()
     
     # Select mode